@@ -1,5 +1,8 @@
+import numpy as np
+
+
 class PIController:
-    def __init__(self, kp, ki, setpoint, output_limits=(0, 2500)):
+    def __init__(self, kp, ki, setpoint, output_limits=(0, 2500), kaw=None):
         """
         Proportional-Integral (PI) Controller.
 
@@ -8,12 +11,15 @@ class PIController:
             ki (float): Integral gain
             setpoint (float): Desired setpoint
             output_limits (tuple): Min and max output limits
+            kaw (float): back-calculation anti-windup gain in 1/s (default ki / kp; 0 disables);
+                kaw * dt is capped at 1 per step, which resets the integrator to the limit
         """
         self.kp = kp
         self.ki = ki
         self.setpoint = setpoint
         self.integral = 0
         self.output_limits = output_limits
+        self.kaw = _default_kaw(kp, ki) if kaw is None else kaw
 
     def update(self, measurement, dt):
         """
@@ -29,4 +35,77 @@ class PIController:
         error = self.setpoint - measurement
         self.integral += error * dt
         output = self.kp * error + self.ki * self.integral
-        return max(self.output_limits[0], min(output, self.output_limits[1]))
+        clamped = max(self.output_limits[0], min(output, self.output_limits[1]))
+        if self.ki:
+            # Back-calculation: bleed the integrator by the clamped-off part of the output.
+            # The per-step gain is capped at 1 (output lands exactly on the limit) so the
+            # explicit update cannot overshoot when kaw * dt > 1.
+            self.integral += min(self.kaw * dt, 1.0) * (clamped - output) / self.ki
+        return clamped
+
+
+def _default_kaw(kp, ki):
+    # Tracking time constant equal to the integral time kp / ki
+    kp = np.asarray(kp, dtype=float)
+    ki = np.asarray(ki, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kaw = np.where(kp != 0, ki / kp, 0.0)
+    return float(kaw) if kaw.ndim == 0 else kaw
+
+
+class PIBank:
+    def __init__(self, n, kp, ki, setpoint, output_limits=(0, 2500), kaw=None):
+        """
+        n PIControllers held as arrays and updated together.
+
+        Every argument may be a scalar (shared) or an array of shape (n,). The per-lane
+        maths matches PIController.update, including back-calculation anti-windup:
+        while a lane is clamped its integrator is driven back towards the limit
+        instead of accumulating (at most all the way in one step, so large dt stays stable).
+
+        Args:
+            n (int): number of controllers
+            kp, ki: proportional and integral gains
+            setpoint: desired setpoints
+            output_limits (tuple): (min, max) output limits, scalars or (n,) arrays
+            kaw: back-calculation gain in 1/s (default ki / kp; 0 disables)
+        """
+        def lane(value):
+            return np.broadcast_to(np.asarray(value, dtype=float), (n,)).copy()
+
+        self.n = n
+        self.kp = lane(kp)
+        self.ki = lane(ki)
+        self.setpoint = lane(setpoint)
+        self.lower = lane(output_limits[0])
+        self.upper = lane(output_limits[1])
+        self.kaw = lane(_default_kaw(self.kp, self.ki) if kaw is None else kaw)
+        self.integral = np.zeros(n)
+
+    def reset(self, lanes=slice(None)):
+        """Zero the integrators of the selected lanes (all by default)."""
+        self.integral[lanes] = 0.0
+
+    def update(self, measurement, dt, lower=None, upper=None):
+        """
+        Compute all PI outputs for one timestep.
+
+        Args:
+            measurement: measured values, scalar or (n,) array
+            dt (float): time step in seconds
+            lower, upper: optional per-step limits overriding output_limits for this call
+
+        Returns:
+            (n,) array of clamped outputs
+        """
+        lower = self.lower if lower is None else lower
+        upper = self.upper if upper is None else upper
+
+        error = self.setpoint - np.asarray(measurement, dtype=float)
+        self.integral += error * dt
+        output = self.kp * error + self.ki * self.integral
+        clamped = np.clip(output, lower, upper)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bleed = np.where(self.ki != 0, np.minimum(self.kaw * dt, 1.0) * (clamped - output) / self.ki, 0.0)
+        self.integral += bleed
+        return clamped
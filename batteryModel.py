@@ -1,18 +1,51 @@
 import math
+from lookupTables import locate_uniform
 
 class Battery:
-    def __init__(self, capacity, voltage, discharge_rate, soc_init=1.0, internal_resistance=0.005):
+    def __init__(self, capacity, voltage, discharge_rate, soc_init=1.0, internal_resistance=0.005, table=None,
+                 temperature_C=25.0):
+        """
+        Lumped battery pack.
+
+        With table (a lookupTables.VoltageTable) the source voltage follows the table's
+        OCV(SoC), scaled so its mean over a full discharge equals voltage, the resistance
+        is internal_resistance times the table's R(SoC, temperature_C) factor, and the
+        nonlinear SoC-drop factor is read from the table too. Without it the battery keeps
+        the fixed nominal voltage and resistance.
+        """
         self.voltage = voltage
         self.r = internal_resistance
         self.capacity_As = capacity * 3600 * 1000 / voltage  # convert kWh to As
         self.current = 0.0
         
         self.capacity = capacity
+        self.nominal_capacity = capacity  # as-new capacity; capacity = nominal_capacity * soh
+        self.soh = 1.0
+        self.cycle_energy_throughput = 0.0
         self.remaining_capacity = capacity * soc_init
         self.soc = max(0.0, min(1.0, soc_init))
         self.discharge_rate = discharge_rate*10**3
         self.discharge_efficiency = 0.90
-        
+
+        self.table = table
+        self.temperature_C = temperature_C
+        if table is not None:
+            # Plain lists for interp_uniform; the resistance column is refreshed if temperature_C changes
+            self._ocv_list = (table.ocv_values * (voltage / table.nominal_ocv)).tolist()
+            self._drop_scale_list = table.drop_scale_values.tolist()
+            self._r_list = None
+            self._r_temperature = None
+
+    def _table_terms(self):
+        # Source voltage, resistance and SoC-drop factor at the present SoC
+        if self._r_temperature != self.temperature_C:
+            self._r_list = (self.table.resistance_column(self.temperature_C) * self.r).tolist()
+            self._r_temperature = self.temperature_C
+        i, w = locate_uniform(len(self._ocv_list), self.soc)
+        ocv, r, scale = self._ocv_list, self._r_list, self._drop_scale_list
+        return (ocv[i] + w * (ocv[i + 1] - ocv[i]), r[i] + w * (r[i + 1] - r[i]),
+                scale[i] + w * (scale[i + 1] - scale[i]))
+
 
     def discharge(self, power_load, dt):
         if power_load <= 0 or self.soc <= 0:
@@ -24,10 +57,15 @@ class Battery:
         if (power_load > self.discharge_rate):
             print("battey cant provide higher than discharge rate")
         
+        if self.table is None:
+            source_voltage, r, scale = self.voltage, self.r, None
+        else:
+            source_voltage, r, scale = self._table_terms()
+
         # Estimate current and terminal voltage with internal resistance
-        current = power_load / self.voltage
+        current = power_load / source_voltage
         #print(f"pwoer load {power_load} self.voltage {self.voltage} current {current}")
-        terminal_voltage = max(0.0, self.voltage - current * self.r)
+        terminal_voltage = max(0.0, source_voltage - current * r)
         current = power_load / terminal_voltage if terminal_voltage > 0 else 0.0
         #print(f"current adjusted {current}")
 
@@ -38,7 +76,8 @@ class Battery:
 
         # SOC drop due to energy drained, with a nonlinear factor
         linear_drop = (current * dt) / self.capacity_As
-        scale = 1.5 - math.exp(-5 * (1 - self.soc))  # nonlinear scale
+        if scale is None:
+            scale = 1.5 - math.exp(-5 * (1 - self.soc))  # nonlinear scale
         nonlinear_drop = linear_drop * scale
 
         # Energy discharged = Power × Time (in hours)
@@ -79,9 +118,9 @@ class Battery:
         # Calculate degradation: linear model
         capacity_loss = battery.cycle_energy_throughput * degradation_rate
 
-        # Update SoH and capacity
+        # Update SoH and capacity (relative to the as-new capacity, so the result does not depend on step count)
         battery.soh = max(0.0, 1.0 - capacity_loss)
-        battery.capacity = battery.capacity * battery.soh
+        battery.capacity = battery.nominal_capacity * battery.soh
 
         # Make sure remaining_capacity and soc do not exceed new capacity
         battery.remaining_capacity = min(battery.remaining_capacity, battery.capacity)
@@ -0,0 +1,234 @@
+"""
+Benchmarks of the model hot paths.
+
+    python benchmark.py run [--quick] [--only NAME ...] [--output bench.json]
+    python benchmark.py compare baseline.json bench.json [--threshold 0.1]
+
+run times every benchmark at each of its sizes with fixed seeds and writes throughput
+(units/s) and peak traced memory to JSON. compare diffs two such files and exits with
+status 1 when any case got slower or hungrier than threshold allows.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+FORMAT_VERSION = 1
+SEED = 0
+
+# Sizes in steps: 15-min day, 1-min day, 1 s day, 1 s week
+STEP_SIZES = (96, 1440, 86400, 604800)
+HOUSE_SIZES = (10, 100, 1000, 10000)
+CYCLE_SIZES = (300, 3000, 30000)
+QUICK_LIMIT = 86400
+
+# Storage sized so neither device empties within a 1 s week (an empty device takes a short cut)
+BATTERY = dict(capacity=50000, voltage=480, discharge_rate=250)
+SUPERCAP = dict(capacitance=100000, voltage_init=480)
+
+
+def _seed():
+    import numpy as np
+    random.seed(SEED)
+    np.random.seed(SEED)
+
+
+def _demand_W(steps):
+    import numpy as np
+    return np.random.default_rng(SEED).uniform(0, 20000, steps)
+
+
+def bench_battery_discharge(steps):
+    from batteryModel import Battery
+    demand = _demand_W(steps).tolist()
+    battery = Battery(**BATTERY)
+
+    def run():
+        for p in demand:
+            battery.discharge(p, 1)
+    return run
+
+
+def bench_battery_discharge_table(steps):
+    from batteryModel import Battery
+    from lookupTables import default_cell_table
+    demand = _demand_W(steps).tolist()
+    battery = Battery(**BATTERY, table=default_cell_table())
+
+    def run():
+        for p in demand:
+            battery.discharge(p, 1)
+    return run
+
+
+def bench_supercap_deliver_power(steps):
+    from supercapModel import Supercapacitor
+    demand = (-_demand_W(steps) / 2).tolist()
+    supercap = Supercapacitor(**SUPERCAP)
+
+    def run():
+        for p in demand:
+            supercap.deliver_power(p, 1)
+    return run
+
+
+def bench_ems_dispatch(steps):
+    from batteryModel import Battery
+    from supercapModel import Supercapacitor
+    from emsController import EMSController
+    demand = _demand_W(steps).tolist()
+    ems = EMSController(Battery(**BATTERY), Supercapacitor(**SUPERCAP))
+
+    def run():
+        for p in demand:
+            ems.dispatch(p, 1)
+    return run
+
+
+def bench_run_simulation(steps):
+    from loadProfile import generate_community_load_profile_batched
+    from main import run_simulation
+    load, t = generate_community_load_profile_batched(10, 21.0, steps, seed=SEED)
+    dt = 86400 / steps
+
+    def run():
+        run_simulation(10, 21.0, steps, dt, load_source=[(load, t)])
+    return run
+
+
+def bench_generate_community_load_profile(houses):
+    from loadProfile import generate_community_load_profile
+
+    def run():
+        generate_community_load_profile(houses, 21.0, time_steps=96)
+    return run
+
+
+def bench_simulate_degradation(cycles):
+    from plotDegradation import Battery, simulate_degradation
+
+    def run():
+        # Slow fade so every size runs its full cycle count
+        battery = Battery('bench', capacity_kWh=100, degradation_factor=1e-7)
+        simulate_degradation(battery, 0.5, 50, max_cycles=cycles)
+    return run
+
+
+# name -> (setup(size) returning a callable, sizes, unit of size)
+BENCHMARKS = {
+    'battery_discharge': (bench_battery_discharge, STEP_SIZES, 'steps'),
+    'battery_discharge_table': (bench_battery_discharge_table, STEP_SIZES, 'steps'),
+    'supercap_deliver_power': (bench_supercap_deliver_power, STEP_SIZES, 'steps'),
+    'ems_dispatch': (bench_ems_dispatch, STEP_SIZES, 'steps'),
+    'run_simulation': (bench_run_simulation, STEP_SIZES, 'steps'),
+    'generate_community_load_profile': (bench_generate_community_load_profile, HOUSE_SIZES, 'houses'),
+    'simulate_degradation': (bench_simulate_degradation, CYCLE_SIZES, 'cycles'),
+}
+
+
+def measure(setup, size, repeat):
+    """Best-of-repeat wall time, then one traced run for peak memory."""
+    best = float('inf')
+    for _ in range(repeat):
+        _seed()
+        run = setup(size)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    _seed()
+    run = setup(size)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(names=None, quick=False, repeat=3):
+    import numpy as np
+    results = []
+    for name, (setup, sizes, unit) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        for size in sizes:
+            if quick and size > QUICK_LIMIT:
+                continue
+            seconds, peak = measure(setup, size, repeat if size <= QUICK_LIMIT else 1)
+            results.append({'benchmark': name, 'size': size, 'unit': unit, 'seconds': seconds,
+                            'throughput': size / seconds, 'peak_memory_bytes': peak})
+            print(f"{name:34s} {size:>8d} {unit:7s} {size / seconds:14,.0f} {unit}/s "
+                  f"{peak / 2**20:9.1f} MiB", flush=True)
+    return {
+        'version': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Cases present in both files whose throughput fell, or peak memory rose, by more
+    than threshold (a fraction). Returns a list of (benchmark, size, metric, old, new).
+    """
+    old = {(r['benchmark'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        base = old.get((r['benchmark'], r['size']))
+        if base is None:
+            continue
+        if r['throughput'] < base['throughput'] * (1 - threshold):
+            regressions.append((r['benchmark'], r['size'], 'throughput', base['throughput'], r['throughput']))
+        if r['peak_memory_bytes'] > base['peak_memory_bytes'] * (1 + threshold):
+            regressions.append((r['benchmark'], r['size'], 'peak_memory_bytes',
+                                base['peak_memory_bytes'], r['peak_memory_bytes']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the HBESS model hot paths.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_cmd = commands.add_parser('run', help="time every benchmark and write JSON")
+    run_cmd.add_argument('--output', default='bench.json')
+    run_cmd.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="benchmarks to run")
+    run_cmd.add_argument('--quick', action='store_true', help=f"skip sizes above {QUICK_LIMIT}")
+    run_cmd.add_argument('--repeat', type=int, default=3, help="timing repeats (best is kept)")
+
+    compare_cmd = commands.add_parser('compare', help="flag regressions against a baseline")
+    compare_cmd.add_argument('baseline')
+    compare_cmd.add_argument('current')
+    compare_cmd.add_argument('--threshold', type=float, default=0.1,
+                             help="allowed fractional slowdown / memory growth")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        report = run_benchmarks(args.only, args.quick, args.repeat)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for name, size, metric, before, after in regressions:
+        print(f"REGRESSION {name} [{size}] {metric}: {before:,.0f} -> {after:,.0f} ({after / before - 1:+.1%})")
+    if not regressions:
+        print("No regressions.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import json
+import os
+import tempfile
+from collections import deque
+import numpy as np
+from transientDetector import TransientDetector
+
+SNAPSHOT_VERSION = 1
+
+# Mutable state of each component; parameters come from the constructors at restore time
+BATTERY_STATE = ('soc', 'remaining_capacity', 'capacity', 'nominal_capacity', 'soh', 'cycle_energy_throughput',
+                 'current')
+SUPERCAP_STATE = ('voltage', 'power')
+ENGINE_STATE = ('batt_current', 'capacity', 'remaining_capacity', 'soc', 'cycle_energy_throughput', 'soh',
+                'sc_voltage', '_step')
+
+
+def _optional(value):
+    # None is stored as an empty array
+    return np.empty(0) if value is None else np.asarray(value, dtype=float)
+
+
+def _unoptional(array):
+    return None if array.size == 0 else array
+
+
+def _battery_state(battery):
+    # Cell-resolved packs (packModel.CellPack) name their own array state
+    names = getattr(battery, 'STATE_FIELDS', BATTERY_STATE)
+    return {name: getattr(battery, name) for name in names if hasattr(battery, name)}
+
+
+def _set_battery_state(battery, state):
+    for name, value in state.items():
+        setattr(battery, name, float(value) if value.ndim == 0 else np.array(value))
+
+
+def _supercap_state(supercap):
+    return {name: getattr(supercap, name) for name in SUPERCAP_STATE}
+
+
+def _set_supercap_state(supercap, state):
+    for name, value in state.items():
+        setattr(supercap, name, float(value))
+
+
+def _ems_state(ems):
+    detector = ems._detector
+    state = {
+        'last_power_change': ems.last_power_change,
+        'splitter': _optional(ems._splitter.state),
+        'freq_integral': ems.freq_pi.integral,
+        'detector': _optional(None if detector is None else
+                              [detector.window, detector._index, detector.last_excursion]),
+    }
+    if detector is not None:
+        state['detector_max'] = np.array(detector._max, dtype=float).reshape(-1, 2)
+        state['detector_min'] = np.array(detector._min, dtype=float).reshape(-1, 2)
+    return state
+
+
+def _set_ems_state(ems, state):
+    ems.last_power_change = float(state['last_power_change'])
+    splitter = _unoptional(state['splitter'])
+    ems._splitter.state = None if splitter is None else float(splitter)
+    ems.freq_pi.integral = np.array(state['freq_integral'], dtype=float)
+
+    detector = _unoptional(state['detector'])
+    if detector is None:
+        ems._detector = None
+        return
+    window, index, last_excursion = detector
+    # The recorded window already reflects the run's dt, so build with any dt and overwrite it
+    ems._detector = TransientDetector(ems.transient_threshold, ems.window_seconds, 1)
+    ems._detector.window = int(window)
+    ems._detector._index = int(index)
+    ems._detector.last_excursion = float(last_excursion)
+    ems._detector._max = deque((int(i), float(v)) for i, v in state['detector_max'])
+    ems._detector._min = deque((int(i), float(v)) for i, v in state['detector_min'])
+
+
+def _counter_state(counter):
+    return {
+        'totals': [counter.damage, counter.cycles, counter._direction],
+        'stack': np.asarray(counter._stack, dtype=float),
+        'candidate': _optional(counter._candidate),
+    }
+
+
+def _set_counter_state(counter, state):
+    damage, cycles, direction = state['totals']
+    counter.damage = float(damage)
+    counter.cycles = float(cycles)
+    counter._direction = int(direction)
+    counter._stack = [float(v) for v in state['stack']]
+    candidate = _unoptional(state['candidate'])
+    counter._candidate = None if candidate is None else float(candidate)
+
+
+def _engine_state(engine):
+    state = {name: getattr(engine, name) for name in ENGINE_STATE}
+    state.update(window=_optional(engine._window), history=_optional(engine._history),
+                 freq_integral=engine.freq_pi.integral)
+    return state
+
+
+def _set_engine_state(engine, state):
+    for name in ENGINE_STATE:
+        setattr(engine, name, np.array(state[name]) if name != '_step' else int(state[name]))
+    window = _unoptional(state['window'])
+    engine._window = None if window is None else window.astype(int)
+    history = _unoptional(state['history'])
+    engine._history = None if history is None else np.array(history)
+    engine._extremes = None
+    engine.freq_pi.integral = np.array(state['freq_integral'], dtype=float)
+
+
+COMPONENTS = {
+    'battery': (_battery_state, _set_battery_state),
+    'supercap': (_supercap_state, _set_supercap_state),
+    'ems': (_ems_state, _set_ems_state),
+    'counter': (_counter_state, _set_counter_state),
+    'engine': (_engine_state, _set_engine_state),
+}
+
+
+class Snapshot:
+    def __init__(self, step, arrays, rng_state=None, generator_state=None):
+        """
+        Full mutable simulation state at a step boundary.
+
+        arrays maps 'component.field' to NumPy arrays; the RNG states are those of the
+        legacy global np.random (used by generate_community_load_profile) and of an
+        optional np.random.Generator. Build one with Snapshot.capture, write it with
+        save() and apply it to freshly constructed objects with restore(), as often as
+        needed: restoring copies, so one warm-up snapshot can seed any number of forks.
+        """
+        self.step = int(step)
+        self.arrays = arrays
+        self.rng_state = rng_state
+        self.generator_state = generator_state
+
+    @classmethod
+    def capture(cls, step, rng=None, **components):
+        """
+        Args:
+            step (int): number of simulation steps completed
+            rng (np.random.Generator): optional generator whose state is recorded too
+            components: any of battery=, supercap=, ems=, counter= (rainflow.RainflowCounter),
+                        engine= (simEngine.HESSEngine)
+        """
+        arrays = {}
+        for name, component in components.items():
+            if component is None:
+                continue
+            if name not in COMPONENTS:
+                raise ValueError(f"Unknown snapshot component: {name}")
+            for field, value in COMPONENTS[name][0](component).items():
+                arrays[f'{name}.{field}'] = np.array(value)
+
+        kind, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+        rng_state = {'kind': kind, 'keys': keys.copy(), 'pos': pos, 'has_gauss': has_gauss,
+                     'cached_gaussian': cached_gaussian}
+        generator_state = None if rng is None else rng.bit_generator.state
+        return cls(step, arrays, rng_state, generator_state)
+
+    def components(self):
+        return sorted({key.split('.', 1)[0] for key in self.arrays})
+
+    def restore(self, rng=None, **components):
+        """
+        Load the recorded state into the given (freshly constructed) objects and reset the
+        RNGs. Components not passed are left alone; returns the step index to resume at.
+        """
+        for name, component in components.items():
+            if component is None:
+                continue
+            prefix = name + '.'
+            state = {key[len(prefix):]: value.copy() for key, value in self.arrays.items() if key.startswith(prefix)}
+            if name not in COMPONENTS or not state:
+                raise ValueError(f"Snapshot has no state for component: {name}")
+            COMPONENTS[name][1](component, state)
+
+        if self.rng_state is not None:
+            s = self.rng_state
+            np.random.set_state((s['kind'], s['keys'], s['pos'], s['has_gauss'], s['cached_gaussian']))
+        if rng is not None and self.generator_state is not None:
+            rng.bit_generator.state = self.generator_state
+        return self.step
+
+    def save(self, path):
+        """Write the snapshot as one .npz file (atomically replacing path)."""
+        meta = {'version': SNAPSHOT_VERSION, 'step': self.step, 'generator_state': self.generator_state}
+        payload = {'meta': np.frombuffer(json.dumps(meta, default=int).encode(), dtype=np.uint8)}
+        if self.rng_state is not None:
+            rng_meta = {k: v for k, v in self.rng_state.items() if k != 'keys'}
+            payload['rng.meta'] = np.frombuffer(json.dumps(rng_meta).encode(), dtype=np.uint8)
+            payload['rng.keys'] = self.rng_state['keys']
+        payload.update(('state.' + key, value) for key, value in self.arrays.items())
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **payload)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(data['meta'].tobytes())
+            if meta.get('version') != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version {meta.get('version')} (expected {SNAPSHOT_VERSION})")
+            rng_state = None
+            if 'rng.meta' in data:
+                rng_state = dict(json.loads(data['rng.meta'].tobytes()), keys=data['rng.keys'])
+            arrays = {key[len('state.'):]: data[key] for key in data.files if key.startswith('state.')}
+        return cls(meta['step'], arrays, rng_state, meta['generator_state'])
+
+
+def as_snapshot(snapshot):
+    """Accept a Snapshot or a path to a saved one."""
+    return snapshot if isinstance(snapshot, Snapshot) else Snapshot.load(snapshot)
+
+
+def skip_steps(load_source, steps):
+    """Drop the first steps samples of a (load_kw, time) chunk stream, e.g. to resume a run."""
+    for load_chunk, time_chunk in load_source:
+        if steps >= len(load_chunk):
+            steps -= len(load_chunk)
+            continue
+        yield load_chunk[steps:], time_chunk[steps:]
+        steps = 0
@@ -0,0 +1,147 @@
+"""
+Command-line entry point.
+
+    python cli.py run    [--houses N] [--steps N] [--dt S] [--seed N] [--output results.npz] [--profile PATH]
+    python cli.py sweep  --grid capacitance=500,1000 transient_threshold=500,1000 [--output rows.csv]
+    python cli.py plot   {hess,degradation,response} [--headless DIR]
+    python cli.py bench  run|compare ...
+
+Only this module's own imports run at start-up; the model, NumPy-heavy helpers and
+matplotlib are imported by the subcommand that needs them, and matplotlib only by plot.
+"""
+import argparse
+import sys
+
+
+def _add_load_args(parser):
+    parser.add_argument('--houses', type=int, default=10, help="houses in the community")
+    parser.add_argument('--daily-kwh', type=float, default=21.0, help="daily energy per house (kWh)")
+    parser.add_argument('--steps', type=int, default=96, help="load samples per day")
+    parser.add_argument('--dt', type=float, default=None, help="timestep in seconds (default 86400 / steps)")
+    parser.add_argument('--seed', type=int, default=0, help="load profile seed (profiles are cached on disk)")
+
+
+def _dt(args):
+    return 86400 / args.steps if args.dt is None else args.dt
+
+
+def cmd_run(args):
+    import numpy as np
+    import profiling
+    from main import run_simulation
+
+    def run():
+        return run_simulation(args.houses, args.daily_kwh, args.steps, _dt(args), use_supercap=not args.no_supercap,
+                              vectorized=args.vectorized, decimation=args.decimation, seed=args.seed,
+                              degradation=args.degradation, dispatch_mode=args.dispatch_mode,
+                              resume_from=args.resume, checkpoint_path=args.checkpoint)
+
+    if args.profile:
+        time, load, results, soh = profiling.profile_run(run, output=args.profile)
+    else:
+        time, load, results, soh = run()
+
+    print(f"rows={len(time)} final_soc={results['soc_batt'][-1]:.4f} final_soh={soh[-1]:.6f} "
+          f"peak_batt_power_kW={np.max(results['batt_power']) / 1000:.2f}")
+    if args.output:
+        np.savez(args.output, time=time, load=load, **{field: results[field] for field in results})
+    return 0
+
+
+def _parse_grid(items):
+    axes = {}
+    for item in items:
+        name, _, values = item.partition('=')
+        if not values:
+            raise SystemExit(f"--grid expects name=v1,v2,...; got {item!r}")
+        axes[name] = [float(v) for v in values.split(',')]
+    return axes
+
+
+def cmd_sweep(args):
+    import csv
+    from profileCache import cached_community_load_profile
+    from sweep import build_grid, run_sweep
+
+    grid = build_grid(**_parse_grid(args.grid))
+    load, _ = cached_community_load_profile(args.houses, args.daily_kwh, args.steps, seed=args.seed)
+    rows = run_sweep(grid, load, _dt(args), processes=args.processes)
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def cmd_plot(args):
+    import plotUtils
+
+    if args.headless is not None:
+        plotUtils.set_headless(args.headless or plotUtils.FIG_DIR)
+    if args.figure == 'hess':
+        from main import main
+        main(plot=True)
+    elif args.figure == 'degradation':
+        from plotDegradation import plot_degradation
+        plot_degradation()
+    else:
+        from plotResponse import plot_step_response
+        plot_step_response()
+    return 0
+
+
+def cmd_bench(args):
+    import benchmark
+    return benchmark.main(args.bench_args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="HBESS model command line.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="run one simulation and print its KPIs")
+    _add_load_args(run)
+    run.add_argument('--no-supercap', action='store_true', help="battery only")
+    run.add_argument('--vectorized', action='store_true', help="use the array-backed HESSEngine")
+    run.add_argument('--decimation', type=int, default=1, help="keep every Nth step")
+    run.add_argument('--degradation', choices=('throughput', 'rainflow'), default='throughput')
+    run.add_argument('--dispatch-mode', choices=('threshold', 'filter'), default='threshold')
+    run.add_argument('--resume', metavar='SNAPSHOT', help="continue from a checkpoint snapshot")
+    run.add_argument('--checkpoint', metavar='PATH', help="write a snapshot after the last step")
+    run.add_argument('--output', metavar='PATH', help="save time, load and result columns as .npz")
+    run.add_argument('--profile', nargs='?', const='profile.folded', metavar='PATH',
+                     help="print a per-stage breakdown and write collapsed stacks to PATH")
+    run.set_defaults(handler=cmd_run)
+
+    sweep = commands.add_parser('sweep', help="run a parameter grid on one load profile")
+    _add_load_args(sweep)
+    sweep.add_argument('--grid', nargs='+', required=True, metavar='NAME=V1,V2',
+                       help="sweep axes, see sweep.SWEEP_PARAMS")
+    sweep.add_argument('--processes', type=int, default=None, help="worker processes")
+    sweep.add_argument('--output', metavar='PATH', help="CSV file (default stdout)")
+    sweep.set_defaults(handler=cmd_sweep)
+
+    plot = commands.add_parser('plot', help="render a figure")
+    plot.add_argument('figure', choices=('hess', 'degradation', 'response'))
+    plot.add_argument('--headless', nargs='?', const='', metavar='DIR',
+                      help="save figures to DIR (default plotUtils.FIG_DIR) instead of showing them")
+    plot.set_defaults(handler=cmd_plot)
+
+    bench = commands.add_parser('bench', help="benchmark.py run / compare", add_help=False)
+    bench.add_argument('bench_args', nargs=argparse.REMAINDER)
+    bench.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,54 +1,94 @@
-from collections import deque
-from droopControl import droop_control
-from PIController import PIController
+from droopControl import k_f
+from PIController import PIBank
+from resultRecorder import RESULT_FIELDS
+from transientDetector import TransientDetector
+from frequencySplit import LowPassSplitter
+
+DISPATCH_FIELDS = RESULT_FIELDS[:-1]  # everything except 'soh'
 
 class EMSController:
-    def __init__(self, battery, supercap, transient_threshold=1000, window_seconds=1):
+    def __init__(self, battery, supercap, transient_threshold=1000, window_seconds=1, telemetry=None,
+                 mode='threshold', filter_time_constant=60.0, f_nom=50.0, freq_kp=k_f, freq_ki=50.0):
+        """
+        telemetry: optional telemetry.EMSTelemetry; None disables all event bookkeeping.
+        mode: 'threshold' dispatches the supercap on detected transients; 'filter' gives the
+              battery the low-pass filtered demand and the supercap the residual
+              (frequencySplit.LowPassSplitter with filter_time_constant seconds); the
+              part of the residual the supercap cannot supply (dips, or spikes above its
+              discharge rate) goes back to the battery.
+        f_nom, freq_kp (W/Hz), freq_ki (W/Hz/s): frequency-response PI. When dispatch is given
+              f_measured, under-frequency adds supercap discharge within its remaining headroom.
+        """
+        if mode not in ('threshold', 'filter'):
+            raise ValueError(f"Unknown EMS mode: {mode}")
+        self.mode = mode
+        self._splitter = LowPassSplitter(filter_time_constant)
         self.battery = battery
         self.supercap = supercap
         self.transient_threshold = transient_threshold
         self.window_seconds = window_seconds
-        self._power_history = deque(maxlen=window_seconds)
+        self._detector = None  # created on the first step, once dt is known
+        self.last_power_change = 0.0
+        self.telemetry = telemetry
+
+        self.freq_pi = PIBank(1, kp=freq_kp, ki=freq_ki, setpoint=f_nom,
+                              output_limits=(0, supercap.discharge_rate))
 
-        self.batt_pi = PIController(kp=0.1, ki=0.05, setpoint=0, output_limits=(-1000, 0))
+    def detect_transient(self, instanenous_power_demand, dt=1):
+        # The window covers window_seconds of history at this dt (see transientDetector.window_samples)
+        if self._detector is None:
+            self._detector = TransientDetector(self.transient_threshold, self.window_seconds, dt)
 
-    def detect_transient(self, instanenous_power_demand):
-        self._power_history.append(instanenous_power_demand)
+        is_transient = self._detector.update(instanenous_power_demand)
+        self.last_power_change = self._detector.last_excursion
+        return is_transient
 
-        if len(self._power_history) < self.window_seconds:
-            return False
+    def frequency_response(self, f_measured, sc_power, dt):
+        """Extra supercap discharge (W, >= 0) for f_measured, limited to what sc_power leaves free."""
+        headroom = max(0.0, self.supercap.discharge_rate - abs(sc_power))
+        return float(self.freq_pi.update(f_measured, dt, upper=headroom)[0])
 
-        power_change = abs(instanenous_power_demand - self._power_history[0])
-        print(f'[TRANSIENT CHECK] Power over {self.window_seconds}s: {power_change:.2f}W')
+    def dispatch(self, instanenous_power_demand, dt, f_measured=None):
+        return dict(zip(DISPATCH_FIELDS, self.dispatch_values(instanenous_power_demand, dt, f_measured)))
 
-        return power_change > self.transient_threshold
+    def dispatch_values(self, instanenous_power_demand, dt, f_measured=None):
+        """
+        Same as dispatch() but returns a tuple in DISPATCH_FIELDS order, avoiding a dict per step.
+        Both modes split the load as demand = batt_power - sc_power (sc_power < 0 when the
+        supercap discharges).
+        f_measured (Hz), when given, enables frequency response on top of the load split.
+        """
+        if self.mode == 'filter':
+            # Slow component to the battery, fast residual to the SC (negative when discharging).
+            # The SC only discharges, up to its rate; whatever it cannot take stays with the battery.
+            slow, fast = self._splitter.update(instanenous_power_demand, dt)
+            sc_power = -min(max(fast, 0.0), self.supercap.discharge_rate)
+            batt_power_requested = instanenous_power_demand + sc_power
+            is_transient = False
+            self.last_power_change = fast
+        else:
+            is_transient = self.detect_transient(instanenous_power_demand, dt)
 
-    def dispatch(self, instanenous_power_demand, dt, f_measured=49.8):
-        is_transient = self.detect_transient(instanenous_power_demand)
-        print(f"{instanenous_power_demand}")
+            sc_power = 0.0
+            if is_transient:
+                # SC will discharge up to its max discharge rate (negative because discharging)
+                sc_power = -min(abs(instanenous_power_demand), self.supercap.discharge_rate)
 
-        sc_power = 0.0
-        if is_transient:
-            print("[INFO] Transient detected")
-            # SC will discharge up to its max discharge rate (negative because discharging)
-            sc_power = -min(abs(instanenous_power_demand), self.supercap.discharge_rate)
+            # Remaining power to be handled by battery (sc_power < 0 is supplied by the SC)
+            batt_power_requested = instanenous_power_demand + sc_power
 
-        # Remaining power to be handled by battery
-        batt_power_requested = instanenous_power_demand - sc_power
+        if f_measured is not None:
+            # Frequency support comes from the supercap alone; the battery request is unchanged
+            sc_power -= self.frequency_response(f_measured, sc_power, dt)
 
         # Dispatch to devices
         v_sc, i_sc = self.supercap.deliver_power(sc_power, dt)
         v_batt, i_batt = self.battery.discharge(batt_power_requested, dt)
 
-        print(f"[DISPATCH] Load: {instanenous_power_demand:.2f}W | SC: {sc_power:.2f}W | Batt: {batt_power_requested:.2f}W")
-
-        return {
-            'load_power': instanenous_power_demand,
-            'sc_power': sc_power,
-            'batt_power': batt_power_requested,
-            'v_sc': v_sc,
-            'v_batt': v_batt,
-            'i_sc': i_sc,
-            'i_batt': i_batt,
-            'soc_batt': self.battery.soc
-        }
+        values = (instanenous_power_demand, sc_power, batt_power_requested,
+                  v_sc, v_batt, i_sc, i_batt, self.battery.soc)
+
+        if self.telemetry is not None:
+            self.telemetry.on_step(dt, is_transient, self.last_power_change, values)
+
+        return values
@@ -0,0 +1,198 @@
+import os
+from multiprocessing import Pool
+import numpy as np
+from meterData import MeteredLoad
+from resultRecorder import ResultRecorder, RESULT_FIELDS
+from sweep import LaneSummary, build_engine
+
+SITE_SUMMARY_FIELDS = ('steps', 'final_soc', 'final_soh', 'peak_batt_power_kW', 'batt_energy_kWh',
+                       'sc_energy_used_kWh', 'load_energy_kWh')
+
+# Fleet-wide time series summed over sites every step
+FLEET_SERIES_FIELDS = ('load_power', 'batt_power', 'sc_power', 'net_feeder_power')
+
+SOH_BINS = np.linspace(0.0, 1.0, 101)
+
+
+def metered_source(store_dir, dt, chunk_seconds=3600):
+    """
+    Picklable load source for a metered site: the (load_kw, time_hours) chunks of the
+    meterData store in store_dir, opened inside the worker so only the path is shipped.
+    """
+    return MeteredLoad.open(store_dir).chunks(dt, chunk_seconds=chunk_seconds)
+
+
+def _open_source(load):
+    # A site's load is a zero-argument callable returning (load_kw, time) chunks, or a kW array
+    if callable(load):
+        return iter(load())
+    return iter([(np.asarray(load, dtype=float), None)])
+
+
+def _lockstep(sources):
+    """
+    Yields (steps, n_sites) blocks of load in kW, advancing every site's chunk stream in
+    step. Chunk boundaries need not line up between sites; the run ends with the
+    shortest source.
+    """
+    streams = [_open_source(load) for load in sources]
+    pending = [np.empty(0) for _ in streams]
+    while True:
+        for i, stream in enumerate(streams):
+            while len(pending[i]) == 0:
+                try:
+                    pending[i] = np.asarray(next(stream)[0], dtype=float)
+                except StopIteration:
+                    return
+        steps = min(len(p) for p in pending)
+        yield np.stack([p[:steps] for p in pending], axis=1)
+        pending = [p[steps:] for p in pending]
+
+
+def _run_shard(sites, dt, base_params, trace_decimation, series_decimation):
+    """Simulate one shard of sites as a single HESSEngine and summarise it."""
+    engine = build_engine(sites, base_params)
+    n = engine.n
+
+    summary = LaneSummary(engine)
+    batt_energy_J = np.zeros(n)
+    load_energy_J = np.zeros(n)
+    series = ResultRecorder(decimation=series_decimation, fields=FLEET_SERIES_FIELDS)
+    traces = None if trace_decimation is None else ResultRecorder(decimation=trace_decimation, width=n)
+
+    steps = 0
+    for block in _lockstep([site['load'] for site in sites]):
+        for demand_kw in block:
+            snapshot = engine.step(demand_kw * 1000, dt)  # kW to W
+            summary.update(snapshot)
+            batt_power_out = snapshot['i_batt'] * snapshot['v_batt']
+            sc_power_out = -snapshot['i_sc'] * snapshot['v_sc']  # i_sc < 0 when discharging
+            batt_energy_J += batt_power_out * dt
+            load_energy_J += snapshot['load_power'] * dt
+            series.record(snapshot['load_power'].sum(), snapshot['batt_power'].sum(), snapshot['sc_power'].sum(),
+                          (snapshot['load_power'] - batt_power_out - sc_power_out).sum())
+            if traces is not None:
+                traces.record_snapshot(snapshot)
+        steps += len(block)
+
+    rows = []
+    for i, (site, lane_row) in enumerate(zip(sites, summary.rows())):
+        row = {key: value for key, value in site.items() if key != 'load'}
+        row.update(lane_row)
+        row.update(steps=steps,
+                   batt_energy_kWh=float(batt_energy_J[i] / 3.6e6),
+                   load_energy_kWh=float(load_energy_J[i] / 3.6e6))
+        if traces is not None:
+            row['trace'] = {field: traces[field][:, i].copy() for field in RESULT_FIELDS}
+        rows.append(row)
+    return rows, {field: series[field] for field in FLEET_SERIES_FIELDS}
+
+
+def _run_indexed_shard(job):
+    # imap_unordered passes one argument; the index restores site order afterwards
+    index, sites, *args = job
+    return index, _run_shard(sites, *args)
+
+
+class FleetTotals:
+    def __init__(self, soh_bins=SOH_BINS):
+        """
+        Fleet aggregates built up one shard at a time, so only the running totals and the
+        per-site summary rows are ever held.
+
+        Attributes:
+            sites (int): sites folded in so far
+            series (dict): FLEET_SERIES_FIELDS -> fleet-summed time series in W
+            soh_counts: histogram of final SoH over soh_bins
+            *_kWh: fleet energy totals
+        """
+        self.soh_bins = np.asarray(soh_bins, dtype=float)
+        self.soh_counts = np.zeros(len(self.soh_bins) - 1, dtype=np.int64)
+        self.sites = 0
+        self.series = None
+        self.load_energy_kWh = 0.0
+        self.batt_energy_kWh = 0.0
+        self.sc_energy_used_kWh = 0.0
+        self._soh = []
+
+    def add(self, rows, series):
+        """Fold one shard's summary rows and summed series into the totals."""
+        self.sites += len(rows)
+        soh = np.array([row['final_soh'] for row in rows])
+        self.soh_counts += np.histogram(np.clip(soh, self.soh_bins[0], self.soh_bins[-1]), self.soh_bins)[0]
+        self._soh.append(soh)
+        self.load_energy_kWh += sum(row['load_energy_kWh'] for row in rows)
+        self.batt_energy_kWh += sum(row['batt_energy_kWh'] for row in rows)
+        self.sc_energy_used_kWh += sum(row['sc_energy_used_kWh'] for row in rows)
+
+        if self.series is None:
+            self.series = {field: np.array(series[field], dtype=float) for field in FLEET_SERIES_FIELDS}
+        else:
+            # Shards share one horizon unless a load source ran short; keep the common part
+            rows_common = min(len(self.series['load_power']), len(series['load_power']))
+            for field in FLEET_SERIES_FIELDS:
+                self.series[field] = self.series[field][:rows_common] + series[field][:rows_common]
+
+    def soh_percentiles(self, q=(5, 50, 95)):
+        """Percentiles of final SoH across every site added so far."""
+        if not self._soh:
+            return np.full(len(q), np.nan)
+        return np.percentile(np.concatenate(self._soh), q)
+
+
+def run_fleet(sites, dt, processes=None, sites_per_shard=64, trace_decimation=None, series_decimation=1,
+              on_site=None, totals=None, **base_params):
+    """
+    Simulate many HBESS sites, each with its own parameters and load.
+
+    Sites are split into shards of sites_per_shard; each shard runs as one vectorised
+    HESSEngine in a worker process, reading its sites' load sources chunk by chunk, so a
+    worker holds one chunk per site plus the (decimated) fleet series rather than the
+    sites' full traces. Shard results are folded into a FleetTotals as they complete.
+
+    Args:
+        sites (list[dict]): one dict per site. 'load' is a zero-argument picklable callable
+            returning (load_kw, time) chunks (e.g. functools.partial of
+            loadProfile.stream_community_load_profile or metered_source) or a kW array;
+            sweep.LANE_PARAMS keys override base_params for that site; all keys but 'load'
+            (e.g. a site name) are copied into the site's summary row.
+        dt (float): timestep in seconds
+        processes (int): worker processes (default os.cpu_count(); 1 runs in-process)
+        sites_per_shard (int): sites simulated together in one engine
+        trace_decimation (int): when given, each row carries a 'trace' dict of every
+            RESULT_FIELDS column at every Nth step
+        series_decimation (int): keep every Nth step of the fleet-summed series
+        on_site (callable): called with each site's summary row as its shard completes
+        totals (FleetTotals): accumulator to fold into (a new one by default)
+        base_params: HESSEngine keyword arguments applied to every site
+
+    Returns:
+        (rows, totals): summary rows in site order (site keys plus SITE_SUMMARY_FIELDS)
+        and the FleetTotals
+    """
+    totals = FleetTotals() if totals is None else totals
+    shards = [sites[i:i + sites_per_shard] for i in range(0, len(sites), sites_per_shard)]
+    args = (dt, base_params, trace_decimation, series_decimation)
+    processes = min(processes or os.cpu_count() or 1, max(1, len(shards)))
+
+    by_shard = [None] * len(shards)
+
+    def collect(index, result):
+        rows, series = result
+        totals.add(rows, series)
+        if on_site is not None:
+            for row in rows:
+                on_site(row)
+        by_shard[index] = rows
+
+    if processes == 1:
+        for index, shard in enumerate(shards):
+            collect(index, _run_shard(shard, *args))
+    else:
+        with Pool(processes) as pool:
+            jobs = [(index, shard) + args for index, shard in enumerate(shards)]
+            for index, result in pool.imap_unordered(_run_indexed_shard, jobs):
+                collect(index, result)
+
+    return [row for rows in by_shard for row in rows], totals
+
@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def _alpha(dt, time_constant):
+    # Discretised first-order low-pass: y += alpha * (x - y)
+    return dt / (time_constant + dt)
+
+
+class LowPassSplitter:
+    def __init__(self, time_constant):
+        """
+        Online frequency split of power demand with a first-order IIR low-pass filter.
+
+        The filtered (slow) component goes to the battery and the residual (fast)
+        component to the supercapacitor. State is one float; each update is O(1).
+
+        Args:
+            time_constant (float): filter time constant in seconds (cut-off 1 / (2*pi*tau) Hz)
+        """
+        self.time_constant = time_constant
+        self.state = None  # last filter output; starts at the first demand sample
+
+    def update(self, power_demand, dt):
+        """Returns (slow, fast) parts of power_demand; slow + fast == power_demand."""
+        if self.state is None:
+            self.state = power_demand
+        else:
+            self.state += _alpha(dt, self.time_constant) * (power_demand - self.state)
+        return self.state, power_demand - self.state
+
+
+def split_load(load_W, dt, time_constant, initial=None):
+    """
+    Vectorised LowPassSplitter over a whole load array.
+
+    The recursion y[n] = (1 - a) y[n-1] + a x[n] is solved in closed form per block with
+    a scaled cumulative sum; blocks are kept short enough that the scale factors stay
+    well inside floating-point range.
+
+    Args:
+        load_W: demand samples
+        dt (float): sample spacing in seconds
+        time_constant (float): filter time constant in seconds
+        initial (float): filter state before the first sample (default: first sample)
+
+    Returns:
+        slow, fast: arrays with slow + fast == load_W
+    """
+    x = np.asarray(load_W, dtype=float)
+    slow = np.empty_like(x)
+    if len(x) == 0:
+        return slow, x.copy()
+
+    a = _alpha(dt, time_constant)
+    y = x[0] if initial is None else float(initial)
+    if a >= 1.0:
+        return x.copy(), np.zeros_like(x)
+
+    log_decay = np.log1p(-a)
+    block = max(1, int(20 / -log_decay))
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        k = np.arange(1, len(chunk) + 1)
+        decay = np.exp(k * log_decay)  # (1 - a)^k
+        slow[start:start + len(chunk)] = decay * (y + a * np.cumsum(chunk / decay))
+        y = slow[start + len(chunk) - 1]
+
+    return slow, x - slow
+
+
+def frequency_split_dispatch(load_W, dt, time_constant, sc_discharge_rate=np.inf):
+    """
+    Offline power allocation of the filter dispatch mode for a whole load array, keyed
+    like EMSController.dispatch (supercap power negative when discharging). As there,
+    the supercap only discharges, up to sc_discharge_rate (W), and the battery covers
+    the rest of the load.
+    """
+    load_W = np.asarray(load_W, dtype=float)
+    _, fast = split_load(load_W, dt, time_constant)
+    sc_share = np.clip(fast, 0.0, sc_discharge_rate)
+    return {
+        'load_power': load_W,
+        'sc_power': -sc_share,
+        'batt_power': load_W - sc_share,
+    }
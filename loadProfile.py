@@ -1,5 +1,22 @@
 import numpy as np
-import matplotlib.pyplot as plt
+
+
+# Bump whenever the generators' output changes for the same parameters and seed, so
+# profileCache stops serving profiles made by the old code
+PROFILE_VERSION = 2
+
+
+def base_house_curve(t):
+    """Noise-free single-house shape (kW, before scaling) at hours-of-day t."""
+    # Morning and evening peaks
+    morning_peak = np.exp(-0.5 * ((t - 7.5) / 1.0) ** 2)
+    evening_peak = np.exp(-0.5 * ((t - 18.5) / 1.5) ** 2)
+
+    # Base load
+    base_load = 0.2 + 0.1 * np.sin(2 * np.pi * t / 24)
+
+    return base_load + 2.0 * morning_peak + 3.0 * evening_peak
+
 
 def generate_community_load_profile(num_houses, daily_kWh_per_house, time_steps=96):
     """
@@ -44,15 +61,8 @@ def generate_community_load_profile(num_houses, daily_kWh_per_house, time_steps=
     def single_house_profile():
         t = np.linspace(0, 24, time_steps)
 
-        # Morning and evening peaks
-        morning_peak = np.exp(-0.5 * ((t - 7.5) / 1.0) ** 2)
-        evening_peak = np.exp(-0.5 * ((t - 18.5) / 1.5) ** 2)
-
-        # Base load
-        base_load = 0.2 + 0.1 * np.sin(2 * np.pi * t / 24)
-
         # Total profile (before scaling)
-        profile = base_load + 2.0 * morning_peak + 3.0 * evening_peak
+        profile = base_house_curve(t)
         profile += 0.05 * np.random.randn(time_steps)  # small noise
         profile = np.clip(profile, 0, None)
 
@@ -71,3 +81,136 @@ def generate_community_load_profile(num_houses, daily_kWh_per_house, time_steps=
     time_vector = np.linspace(0, 24, time_steps)
 
     return community_load_kw, time_vector
+
+
+def _day_chunks(base, day_seed, num_houses, chunk_steps, house_batch, num_transients, magnitude_range, duration_range):
+    """
+    Yields (start, stop, h0, h1, profile) for one day, where profile is the unscaled
+    (h1 - h0, stop - start) load of houses h0:h1. Rebuilding the generator from the
+    same day_seed replays exactly the same values.
+    """
+    rng = np.random.default_rng(day_seed)
+    n = len(base)
+
+    # Transient events for every house are drawn up front: O(houses) memory
+    shape = (num_houses, num_transients)
+    starts = rng.integers(0, n - 1, shape)
+    ends = np.minimum(starts + rng.integers(duration_range[0], duration_range[1] + 1, shape), n)
+    magnitudes = rng.uniform(*magnitude_range, shape)
+    signed = np.where(rng.random(shape) > 0.5, 1.0, -1.0) * magnitudes
+
+    for start in range(0, n, chunk_steps):
+        stop = min(start + chunk_steps, n)
+        idx = np.arange(start, stop)
+        for h0 in range(0, num_houses, house_batch):
+            h1 = min(h0 + house_batch, num_houses)
+            profile = base[start:stop] + 0.05 * rng.standard_normal((h1 - h0, stop - start))
+            profile = np.clip(profile, 0, None)
+
+            for k in range(num_transients):
+                active = (idx >= starts[h0:h1, k:k + 1]) & (idx < ends[h0:h1, k:k + 1])
+                profile += signed[h0:h1, k:k + 1] * active
+                np.clip(profile, 0, None, out=profile)  # prevent negative load
+
+            yield start, stop, h0, h1, profile
+
+
+def stream_community_load_profile(num_houses, daily_kWh_per_house, time_steps=96, days=1, chunk_steps=None,
+                                  house_batch=256, seed=None, num_transients=5, magnitude_range=(0.5, 3.0),
+                                  duration_range=(1, 3)):
+    """
+    Streaming version of generate_community_load_profile for long horizons.
+
+    Yields (community_load_kw, time_hours) chunks of at most chunk_steps samples
+    (default: one hour) over the requested number of days. Only a
+    (house_batch, chunk_steps) block of per-house load is held at any time; each day
+    is generated twice from the same seed, first to find every house's daily energy
+    scaling and then to emit the scaled, house-summed chunks.
+
+    Args:
+        num_houses (int): houses on the feeder
+        daily_kWh_per_house (float): energy each house uses per day
+        time_steps (int): samples per day
+        days (int): number of days to generate
+        chunk_steps (int): samples per yielded chunk
+        house_batch (int): houses synthesised together in one block
+        seed: seed for np.random.SeedSequence; None draws fresh entropy. The same
+              (seed, chunk_steps, house_batch) always reproduces the same profile.
+    """
+    if chunk_steps is None:
+        chunk_steps = max(1, time_steps // 24)
+
+    t_day = np.linspace(0, 24, time_steps)
+    base = base_house_curve(t_day)
+    args = (num_houses, chunk_steps, house_batch, num_transients, magnitude_range, duration_range)
+
+    for day, day_seed in enumerate(np.random.SeedSequence(seed).spawn(days)):
+        # Pass 1: daily energy per house
+        energy_kWh = np.zeros(num_houses)
+        for _, _, h0, h1, profile in _day_chunks(base, day_seed, *args):
+            energy_kWh[h0:h1] += profile.sum(axis=1)
+        scale = daily_kWh_per_house / (energy_kWh * (24 / time_steps))
+
+        # Pass 2: replay the same draws, scale and sum houses per chunk
+        chunk = None
+        for start, stop, h0, h1, profile in _day_chunks(base, day_seed, *args):
+            if h0 == 0:
+                chunk = np.zeros(stop - start)
+            chunk += scale[h0:h1] @ profile
+            if h1 == num_houses:
+                # Timestamps from the global sample index: strictly increasing across days
+                yield chunk, (day * time_steps + np.arange(start, stop)) * (24 / time_steps)
+
+
+def synthesize_house_profiles(num_houses, daily_kWh_per_house, time_steps, rng, num_transients=5,
+                              magnitude_range=(0.5, 3.0), duration_range=(1, 3)):
+    """
+    Batched equivalent of single_house_profile: returns a (num_houses, time_steps) array of
+    scaled per-house load (kW) built with whole-array operations.
+
+    Transients are accumulated with a difference array and clipped once, so a dip that
+    overlaps another event is clipped after, rather than between, the two events.
+    """
+    t = np.linspace(0, 24, time_steps)
+    profiles = base_house_curve(t) + 0.05 * rng.standard_normal((num_houses, time_steps))
+    np.clip(profiles, 0, None, out=profiles)
+
+    # Transient start/end/signed magnitude for every house at once
+    shape = (num_houses, num_transients)
+    starts = rng.integers(0, time_steps - 1, shape)
+    ends = np.minimum(starts + rng.integers(duration_range[0], duration_range[1] + 1, shape), time_steps)
+    signed = np.where(rng.random(shape) > 0.5, 1.0, -1.0) * rng.uniform(*magnitude_range, shape)
+
+    rows = np.repeat(np.arange(num_houses), num_transients)
+    steps = np.zeros((num_houses, time_steps + 1))
+    np.add.at(steps, (rows, starts.ravel()), signed.ravel())
+    np.add.at(steps, (rows, ends.ravel()), -signed.ravel())
+    profiles += np.cumsum(steps[:, :-1], axis=1)
+    np.clip(profiles, 0, None, out=profiles)
+
+    # Scale each house to its daily energy consumption (kWh)
+    energy_kWh = profiles.sum(axis=1) * (24 / time_steps)
+    profiles *= (daily_kWh_per_house / energy_kWh)[:, None]
+    return profiles
+
+
+def generate_community_load_profile_batched(num_houses, daily_kWh_per_house, time_steps=96, seed=None,
+                                            house_batch=1024):
+    """
+    Fast, reproducible alternative to generate_community_load_profile for large communities.
+
+    Houses are synthesised house_batch at a time with synthesize_house_profiles, drawing
+    from a np.random.Generator seeded with seed, and summed per batch.
+
+    Returns:
+        community_load_kw, time_vector (same as generate_community_load_profile)
+    """
+    rng = np.random.default_rng(seed)
+    community_load_kw = np.zeros(time_steps)
+
+    for h0 in range(0, num_houses, house_batch):
+        batch = min(house_batch, num_houses - h0)
+        community_load_kw += synthesize_house_profiles(batch, daily_kWh_per_house, time_steps, rng).sum(axis=0)
+
+    time_vector = np.linspace(0, 24, time_steps)
+    return community_load_kw, time_vector
@@ -0,0 +1,78 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class WelchPSD:
+    def __init__(self, dt, segment_length=4096, overlap=0.5):
+        """
+        Incremental Welch power spectral density estimate of a load signal.
+
+        Samples are fed in chunks with update(); overlapping Hann-windowed segments are
+        mean-removed, transformed with rfft and their periodograms averaged. Only the
+        tail of the previous chunk (< segment_length samples) is carried over, so memory
+        is bounded however long the record is.
+
+        Args:
+            dt (float): sample spacing in seconds
+            segment_length (int): samples per segment (sets the frequency resolution)
+            overlap (float): fraction of a segment shared with the next one
+        """
+        self.dt = dt
+        self.segment_length = int(segment_length)
+        self.step = max(1, int(round(self.segment_length * (1 - overlap))))
+        self.window = np.hanning(self.segment_length)
+        self.freqs = np.fft.rfftfreq(self.segment_length, dt)
+
+        self._sum = np.zeros(len(self.freqs))
+        self.segments = 0
+        self._carry = np.empty(0)
+
+    def update(self, chunk):
+        data = np.concatenate([self._carry, np.asarray(chunk, dtype=float)])
+        n_segments = 0 if len(data) < self.segment_length else (len(data) - self.segment_length) // self.step + 1
+
+        if n_segments:
+            segments = sliding_window_view(data, self.segment_length)[::self.step][:n_segments]
+            segments = (segments - segments.mean(axis=1, keepdims=True)) * self.window
+            self._sum += (np.abs(np.fft.rfft(segments, axis=1)) ** 2).sum(axis=0)
+            self.segments += n_segments
+
+        self._carry = data[n_segments * self.step:]
+        return self
+
+    def psd(self):
+        """One-sided PSD (signal units^2 / Hz) averaged over all segments so far."""
+        if self.segments == 0:
+            raise ValueError(f"Need at least {self.segment_length} samples for one segment")
+        fs = 1.0 / self.dt
+        psd = self._sum / (self.segments * fs * np.sum(self.window ** 2))
+        psd[1:] *= 2
+        if self.segment_length % 2 == 0:
+            psd[-1] /= 2  # Nyquist bin is not mirrored
+        return self.freqs, psd
+
+    def energy_split(self, cutoff_hz):
+        """
+        Share of the signal's variance (power of its fluctuations) above and below
+        cutoff_hz. The high-frequency part is what a supercapacitor would absorb and the
+        remainder what the battery follows.
+        """
+        freqs, psd = self.psd()
+        df = freqs[1] - freqs[0]
+        power = psd * df
+        above = power[freqs > cutoff_hz].sum()
+        total = power.sum()
+        return {
+            'cutoff_hz': cutoff_hz,
+            'power_above': float(above),
+            'power_below': float(total - above),
+            'fraction_above': float(above / total) if total > 0 else 0.0,
+        }
+
+
+def welch_psd(load, dt, segment_length=4096, overlap=0.5, chunk_size=1_000_000):
+    """Welch PSD of an array or memmap, processed chunk_size samples at a time."""
+    estimator = WelchPSD(dt, min(segment_length, len(load)), overlap)
+    for start in range(0, len(load), chunk_size):
+        estimator.update(load[start:start + chunk_size])
+    return estimator
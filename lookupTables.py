@@ -0,0 +1,196 @@
+import os
+import tempfile
+from functools import lru_cache
+import numpy as np
+
+SOC_POINTS = 201  # uniform SoC grid, 0.5 % spacing
+TEMPERATURES_C = (-20.0, 0.0, 10.0, 25.0, 40.0, 55.0)
+REFERENCE_TEMPERATURE_C = 25.0
+
+
+def interp_uniform(values, soc):
+    """
+    Linear interpolation of values (a list sampled on a uniform 0..1 SoC grid) at a scalar
+    soc, clamped to the grid. Pure Python, so per-step scalar models avoid np.interp's
+    call overhead.
+    """
+    i, w = locate_uniform(len(values), soc)
+    return values[i] + w * (values[i + 1] - values[i])
+
+
+def locate_uniform(points, soc):
+    """Cell index and weight of scalar soc on a uniform grid of points, for several lookups at once."""
+    x = (0.0 if soc < 0.0 else 1.0 if soc > 1.0 else soc) * (points - 1)
+    i = int(x)
+    if i > points - 2:
+        i = points - 2
+    return i, x - i
+
+
+class VoltageTable:
+    def __init__(self, ocv, resistance, temperatures=TEMPERATURES_C, drop_scale=None):
+        """
+        Open-circuit voltage and resistance of a storage device tabulated on a uniform SoC
+        grid, so the models read them with one interpolation instead of evaluating curves
+        every step.
+
+        Args:
+            ocv (array): open-circuit voltage at each SoC grid point, SoC 0..1 in len(ocv)
+                equal steps (V per cell, or normalised voltage for a supercap)
+            resistance (array): (len(ocv), len(temperatures)) resistance factor relative to
+                the device's nominal resistance
+            temperatures (sequence): ascending temperature grid in degrees C
+            drop_scale (array): batteryModel's nonlinear SoC-drop factor on the same grid
+                (default 1.5 - exp(-5 (1 - soc)))
+        """
+        self.ocv_values = np.asarray(ocv, dtype=float)
+        n = len(self.ocv_values)
+        if n < 2:
+            raise ValueError("a table needs at least two SoC points")
+        self.soc = np.linspace(0.0, 1.0, n)
+        self.temperatures = np.asarray(temperatures, dtype=float)
+        self.resistance_values = np.asarray(resistance, dtype=float).reshape(n, len(self.temperatures))
+        self.slope_values = np.gradient(self.ocv_values, self.soc)  # V per unit SoC
+        if drop_scale is None:
+            drop_scale = 1.5 - np.exp(-5 * (1 - self.soc))
+        self.drop_scale_values = np.asarray(drop_scale, dtype=float)
+        # Mean OCV over a full discharge: the voltage a pack's nominal voltage corresponds to
+        self.nominal_ocv = float((self.ocv_values[:-1] + self.ocv_values[1:]).mean() / 2)
+        self._column = None
+        self._column_temperature = None
+
+    # Batched lookups over arrays of any shape
+
+    def ocv(self, soc):
+        return np.interp(soc, self.soc, self.ocv_values)
+
+    def ocv_slope(self, soc):
+        return np.interp(soc, self.soc, self.slope_values)
+
+    def drop_scale(self, soc):
+        return np.interp(soc, self.soc, self.drop_scale_values)
+
+    def resistance_factor(self, soc, temperature_C=REFERENCE_TEMPERATURE_C):
+        """
+        R(SoC, T) factor; broadcasts. A scalar temperature reads one cached SoC column
+        with np.interp, an array of temperatures does a bilinear lookup (both clamped to
+        the grid).
+        """
+        if np.ndim(temperature_C) == 0:
+            return np.interp(soc, self.soc, self.resistance_column(temperature_C))
+        return self._bilinear(soc, temperature_C)
+
+    def resistance_column(self, temperature_C=REFERENCE_TEMPERATURE_C):
+        """Resistance factor over the SoC grid at one temperature; the last one is cached."""
+        temperature_C = float(temperature_C)
+        if temperature_C != self._column_temperature:
+            self._column = self._bilinear(self.soc, temperature_C)
+            self._column_temperature = temperature_C
+        return self._column
+
+    def _bilinear(self, soc, temperature_C):
+        soc, temperature_C = np.broadcast_arrays(np.asarray(soc, dtype=float), np.asarray(temperature_C, dtype=float))
+        x = np.clip(soc, 0.0, 1.0) * (len(self.soc) - 1)
+        i = np.minimum(x.astype(int), len(self.soc) - 2)
+        wx = x - i
+        t = self.temperatures
+        r = self.resistance_values
+        if len(t) == 1:
+            return r[i, 0] + wx * (r[i + 1, 0] - r[i, 0])
+        temperature_C = np.clip(temperature_C, t[0], t[-1])
+        j = np.clip(np.searchsorted(t, temperature_C, side='right') - 1, 0, len(t) - 2)
+        wy = (temperature_C - t[j]) / (t[j + 1] - t[j])
+        low = r[i, j] + wx * (r[i + 1, j] - r[i, j])
+        high = r[i, j + 1] + wx * (r[i + 1, j + 1] - r[i, j + 1])
+        return low + wy * (high - low)
+
+    # Persistence
+
+    def save(self, path):
+        """Write the table to path (.npz), atomically."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, ocv=self.ocv_values, resistance=self.resistance_values, temperatures=self.temperatures,
+                     drop_scale=self.drop_scale_values)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['ocv'], data['resistance'], data['temperatures'], data['drop_scale'])
+
+
+def fit_table(soc, ocv, resistance=None, resistance_soc=None, temperatures=(REFERENCE_TEMPERATURE_C,),
+              points=SOC_POINTS):
+    """
+    VoltageTable resampled from measured points, e.g. a pulse test.
+
+    Args:
+        soc, ocv (array): measured OCV curve (any order; linear between points, held flat
+            beyond the measured SoC range)
+        resistance (array): (len(resistance_soc), len(temperatures)) resistance factors;
+            None for a constant 1.0
+        resistance_soc (array): SoC of resistance's rows (default soc)
+        temperatures (sequence): temperature of resistance's columns
+        points (int): SoC grid size of the table
+    """
+    order = np.argsort(soc)
+    soc = np.asarray(soc, dtype=float)[order]
+    grid = np.linspace(0.0, 1.0, points)
+    table_ocv = np.interp(grid, soc, np.asarray(ocv, dtype=float)[order])
+
+    temperatures = np.atleast_1d(np.asarray(temperatures, dtype=float))
+    if resistance is None:
+        table_r = np.ones((points, len(temperatures)))
+    else:
+        r_soc = soc if resistance_soc is None else np.asarray(resistance_soc, dtype=float)
+        resistance = np.asarray(resistance, dtype=float).reshape(len(r_soc), len(temperatures))
+        r_order = np.argsort(r_soc)
+        table_r = np.column_stack([np.interp(grid, r_soc[r_order], resistance[r_order, k])
+                                   for k in range(len(temperatures))])
+    t_order = np.argsort(temperatures)
+    return VoltageTable(table_ocv, table_r[:, t_order], temperatures[t_order])
+
+
+def _arrhenius(temperatures, activation_K):
+    # Resistance rises as temperature falls, relative to REFERENCE_TEMPERATURE_C
+    kelvin = np.asarray(temperatures, dtype=float) + 273.15
+    return np.exp(activation_K * (1 / kelvin - 1 / (REFERENCE_TEMPERATURE_C + 273.15)))
+
+
+@lru_cache(maxsize=None)
+def default_cell_table(points=SOC_POINTS):
+    """
+    Table of packModel.cell_ocv with an NMC-like R(SoC, T): resistance climbs near empty
+    and full and follows Arrhenius in temperature, 1.0 at mid SoC and 25 C. Built once.
+    """
+    from packModel import cell_ocv  # imported here so the lumped models need not load packModel
+    soc = np.linspace(0.0, 1.0, points)
+    shape = 1 + 0.6 * np.exp(-12 * soc) + 0.15 * np.exp(-20 * (1 - soc))
+    shape /= np.interp(0.5, soc, shape)
+    return VoltageTable(cell_ocv(soc), np.outer(shape, _arrhenius(TEMPERATURES_C, 2500.0)))
+
+
+@lru_cache(maxsize=None)
+def default_supercap_table(points=SOC_POINTS):
+    """
+    Supercapacitor table: OCV is the normalised voltage V / V_max and the ESR factor
+    depends on temperature only (weaker than a cell's). Built once.
+    """
+    soc = np.linspace(0.0, 1.0, points)
+    return VoltageTable(soc, np.outer(np.ones(points), _arrhenius(TEMPERATURES_C, 800.0)),
+                        drop_scale=np.ones(points))
+
+
+_loaded = {}
+
+
+def load_table(path):
+    """VoltageTable saved at path, cached per (path, modification time)."""
+    path = os.path.abspath(path)
+    key = (path, os.stat(path).st_mtime_ns)
+    table = _loaded.get(key)
+    if table is None:
+        table = _loaded[key] = VoltageTable.load(path)
+    return table
@@ -1,9 +1,27 @@
+import itertools
+import numpy as np
 from loadProfile import generate_community_load_profile
-from plotUtils import plot_load_profile, plot_hess_results, plot_load_fft, plot_performance_degradation, plot_cycle_life
+from profileCache import cached_community_load_profile
 from batteryModel import Battery
 from supercapModel import Supercapacitor
 from emsController import EMSController
-import matplotlib.pyplot as plt
+from simEngine import HESSEngine
+from resultRecorder import ResultRecorder
+from rainflow import RainflowCounter
+from checkpoint import Snapshot, as_snapshot, skip_steps
+import profiling
+
+def set_battery_soh(battery, soh):
+    """Set SoH and derive capacity from the nominal (as-new) capacity, keeping remaining capacity and SoC consistent."""
+    if not hasattr(battery, 'nominal_capacity'):
+        battery.nominal_capacity = battery.capacity
+    battery.soh = max(0.0, soh)
+    battery.capacity = battery.nominal_capacity * battery.soh
+
+    # Ensure remaining capacity and soc are consistent with new capacity
+    battery.remaining_capacity = min(battery.remaining_capacity, battery.capacity)
+    battery.soc = max(0.0, min(1.0, battery.remaining_capacity / battery.capacity))
+
 
 def degrade_battery(battery, energy_discharged_kWh, degradation_rate=0.0001):
     """
@@ -14,29 +32,146 @@ def degrade_battery(battery, energy_discharged_kWh, degradation_rate=0.0001):
     """
     if not hasattr(battery, 'cycle_energy_throughput'):
         battery.cycle_energy_throughput = 0.0
-    if not hasattr(battery, 'soh'):
-        battery.soh = 1.0  # State of Health (1 = 100%)
 
     battery.cycle_energy_throughput += energy_discharged_kWh
     capacity_loss = battery.cycle_energy_throughput * degradation_rate
-    battery.soh = max(0.0, 1.0 - capacity_loss)
-    battery.capacity = battery.capacity * battery.soh
+    set_battery_soh(battery, 1.0 - capacity_loss)
 
-    # Ensure remaining capacity and soc are consistent with new capacity
-    battery.remaining_capacity = min(battery.remaining_capacity, battery.capacity)
-    battery.soc = max(0.0, min(1.0, battery.remaining_capacity / battery.capacity))
 
+def degrade_battery_rainflow(battery, counter):
+    """
+    Cycle-based degradation: feed the battery's SoC to a rainflow.RainflowCounter and
+    subtract the damage of any cycles it closes from SoH.
+    """
+    if not hasattr(battery, 'soh'):
+        battery.soh = 1.0
+    damage = counter.update(battery.soc)
+    if damage:
+        set_battery_soh(battery, battery.soh - damage)
+
+
+def run_simulation(num_houses, daily_kWh_per_house, resolution_steps, dt, use_supercap=True, vectorized=False,
+                   decimation=1, load_source=None, seed=None, degradation='throughput', dispatch_mode='threshold',
+                   resume_from=None, checkpoint_path=None, battery=None, frequency=None,
+                   telemetry=None):
+    """
+    Returns (time, load, results, soh_history). results is a ResultRecorder mapping each
+    field to a NumPy column; with decimation > 1 only every Nth step is kept and time/load
+    are sliced to match the recorded rows.
+
+    load_source: optional iterable of (load_kw, time) chunks, e.g.
+    loadProfile.stream_community_load_profile(...) or meterData.MeteredLoad.chunks(dt). When given it replaces the synthetic
+    one-day profile and is consumed chunk by chunk, so memory depends only on the chunk
+    size and the recorded (decimated) rows, not on the horizon.
+
+    seed: when given, the profile is the seeded generator's output served from the
+    on-disk profile cache, so repeated runs reuse the identical profile.
+
+    degradation: 'throughput' (SoH from cumulative kWh, degrade_battery) or 'rainflow'
+    (SoH from counted SoC cycles, degrade_battery_rainflow). The vectorised engine only
+    models throughput degradation; asking it for rainflow raises ValueError.
+
+    dispatch_mode: EMSController mode, 'threshold' or 'filter' (scalar path only;
+    the vectorised engine raises ValueError for 'filter').
+
+    resume_from: checkpoint.Snapshot (or path to one) to continue from. The load source
+    must be the one the snapshot was taken on (same seed / file); its first
+    snapshot.step samples are skipped and only the remaining steps are recorded. Passing
+    one warm-up snapshot to several calls with different settings forks what-if runs.
+    checkpoint_path: write a Snapshot of the state after the last step to this path.
 
-def run_simulation(num_houses, daily_kWh_per_house, resolution_steps, dt, use_supercap=True):
-    # Generate load profile
-    load, time = generate_community_load_profile(
-        num_houses=num_houses,
-        daily_kWh_per_house=daily_kWh_per_house,
-        time_steps=resolution_steps
-    )
+    battery: Battery-like object for the scalar path, e.g. packModel.CellPack for a
+    cell-resolved pack; defaults to the lumped 500 kWh batteryModel.Battery. Not
+    accepted with vectorized=True.
+
+    frequency: optional grid frequency in Hz, a constant or one value per load step of
+    the whole run (indexed by global step, so it lines up with streamed chunks and with
+    resume_from). When given, the supercap adds frequency response on under-frequency.
+
+    telemetry: optional telemetry.EMSTelemetry handed to the EMSController (scalar path
+    only). The caller owns it and closes its trace sink.
+
+    Under profiling.profile_run the loop's stages (load_generation, dispatch, degradation,
+    recording) are timed; otherwise the loop runs untouched.
+    """
+    if degradation not in ('throughput', 'rainflow'):
+        raise ValueError(f"Unknown degradation model: {degradation}")
+    if vectorized and degradation == 'rainflow':
+        raise ValueError("the vectorized engine only supports degradation='throughput'")
+    if vectorized and dispatch_mode != 'threshold':
+        raise ValueError("the vectorized engine only supports dispatch_mode='threshold'")
+    if vectorized and battery is not None:
+        raise ValueError("battery= is only supported on the scalar path")
+    if vectorized and telemetry is not None:
+        raise ValueError("telemetry= is only supported on the scalar path")
+
+    timer = profiling.active()
+    if load_source is None:
+        # Generate load profile
+        with profiling.stage('load_generation'):
+            if seed is not None:
+                load, time = cached_community_load_profile(num_houses, daily_kWh_per_house, resolution_steps, seed=seed)
+            else:
+                load, time = generate_community_load_profile(
+                    num_houses=num_houses,
+                    daily_kWh_per_house=daily_kWh_per_house,
+                    time_steps=resolution_steps
+                )
+        load_source = [(load, time)]
+        expected_steps = resolution_steps
+    else:
+        expected_steps = None
+
+    snapshot = None
+    step = 0
+    if resume_from is not None:
+        snapshot = as_snapshot(resume_from)
+        load_source = skip_steps(load_source, snapshot.step)
+        if expected_steps is not None:
+            expected_steps = max(0, expected_steps - snapshot.step)
+    if timer is not None:
+        # Streaming sources generate (or read) their load as they are iterated
+        load_source = timer.wrap_iter('load_generation', load_source)
+
+    if frequency is not None:
+        frequency = np.asarray(frequency, dtype=float)
+
+    def frequency_chunk(start, n):
+        # Per-step frequency for the chunk starting at global step start (None when unused)
+        if frequency is None:
+            return None
+        if frequency.ndim == 0:
+            return np.full(n, float(frequency))
+        if start + n > len(frequency):
+            raise ValueError("frequency has fewer entries than the load source")
+        return frequency[start:start + n]
+
+    # time and load of the recorded rows, kept with the same decimation as the results
+    trace = ResultRecorder(expected_steps, decimation=decimation, fields=('time', 'load'))
+
+    if vectorized:
+        # Single-scenario run through the array-backed engine
+        engine = HESSEngine(1, use_supercap=use_supercap)
+        if snapshot is not None:
+            step = snapshot.restore(engine=engine)
+        lanes = ResultRecorder(expected_steps, decimation=decimation, width=1)
+        run_chunk, record_trace = engine.run, trace.record
+        if timer is not None:
+            # The engine steps, degrades and records in one call, all timed as dispatch
+            run_chunk, record_trace = timer.wrap('dispatch', run_chunk), timer.wrap('recording', record_trace)
+        for load_chunk, time_chunk in load_source:
+            run_chunk(load_chunk, dt, recorder=lanes, f_measured=frequency_chunk(step, len(load_chunk)))
+            for row in zip(time_chunk, load_chunk):
+                record_trace(*row)
+            step += len(load_chunk)
+        if checkpoint_path is not None:
+            Snapshot.capture(step, engine=engine).save(checkpoint_path)
+        results = lanes.lane(0)
+        return trace['time'], trace['load'], results, results['soh']
 
     # Initialize battery and supercap
-    battery = Battery(capacity=500, voltage=480, discharge_rate=250)  # 500 kWh capacity
+    if battery is None:
+        battery = Battery(capacity=500, voltage=480, discharge_rate=250)  # 500 kWh capacity
     if use_supercap:
         supercap = Supercapacitor(capacitance=1000, voltage_init=480)
     else:
@@ -44,69 +179,139 @@ def run_simulation(num_houses, daily_kWh_per_house, resolution_steps, dt, use_su
 
     # Initialize EMS controller
     if use_supercap:
-        ems = EMSController(battery, supercap)
+        ems = EMSController(battery, supercap, mode=dispatch_mode, telemetry=telemetry)
     else:
         # EMSController without supercap, just give it a dummy supercap with zero discharge
         class DummySupercap:
             discharge_rate = 0
             def deliver_power(self, power, dt):
                 return 0, 0
-        ems = EMSController(battery, DummySupercap())
+        ems = EMSController(battery, DummySupercap(), telemetry=telemetry)
+
+    counter = RainflowCounter() if degradation == 'rainflow' else None
+    if snapshot is not None:
+        step = snapshot.restore(battery=battery, supercap=supercap, ems=ems, counter=counter)
+
+    results = ResultRecorder(expected_steps, decimation=decimation)
+
+    # Per-step callables are bound once; profiling swaps in timed wrappers
+    dispatch, record, record_trace = ems.dispatch_values, results.record, trace.record
+    degrade, degrade_rainflow = degrade_battery, degrade_battery_rainflow
+    if timer is not None:
+        dispatch = timer.wrap('dispatch', dispatch)
+        degrade = timer.wrap('degradation', degrade)
+        degrade_rainflow = timer.wrap('degradation', degrade_rainflow)
+        record = timer.wrap('recording', record)
+        record_trace = timer.wrap('recording', record_trace)
+
+    for load_chunk, time_chunk in load_source:
+        f_chunk = frequency_chunk(step, len(load_chunk))
+        for load_kw, t, f in zip(load_chunk, time_chunk, itertools.repeat(None) if f_chunk is None else f_chunk):
+            power_demand = load_kw * 1000  # kW to W
+            values = dispatch(power_demand, dt, f)
 
-    results = []
-    soh_history = []
-    for t in range(resolution_steps):
-        power_demand = load[t] * 1000  # kW to W
-        snapshot = ems.dispatch(power_demand, dt)
+            # Calculate energy discharged by battery this step in kWh (convert W * sec to kWh)
+            energy_discharged_kWh = abs(values[2]) * dt / 3600 / 1000
 
-        # Calculate energy discharged by battery this step in kWh (convert W * sec to kWh)
-        energy_discharged_kWh = abs(snapshot['batt_power']) * dt / 3600 / 1000
+            # Apply degradation model
+            if counter is None:
+                degrade(battery, energy_discharged_kWh)
+            else:
+                degrade_rainflow(battery, counter)
 
-        # Apply degradation model
-        degrade_battery(battery, energy_discharged_kWh)
+            record(*values, battery.soh)
+            record_trace(t, load_kw)
+        step += len(load_chunk)
 
-        results.append(snapshot)
-        soh_history.append(battery.soh)
+    if checkpoint_path is not None:
+        # Taken before the rainflow residual is closed, so a resumed run keeps counting it
+        Snapshot.capture(step, battery=battery, supercap=supercap, ems=ems, counter=counter).save(checkpoint_path)
 
-    results_dict = {key: [r[key] for r in results] for key in results[0]}
+    if counter is not None:
+        # Close the open half cycles at the end of the run
+        set_battery_soh(battery, battery.soh - counter.finish())
 
-    return time, load, results_dict, soh_history
+    return trace['time'], trace['load'], results, results['soh']
 
 
-def main():
+def main(plot=True, telemetry=None):
+    """
+    Simulate the seeded 10-house community with and without the supercap and plot the
+    comparison. plot=False skips matplotlib entirely and returns the two result sets.
+    telemetry (telemetry.EMSTelemetry) observes the BESS + supercap run.
+    """
     num_houses = 10
     daily_kWh_per_house = 21.0
     resolution_steps = 96  # 15-minute intervals for 24 hours
     dt = 900  # 15 minutes in seconds
+    seed = 0
+
+    # Plot community load profile first (cached on disk for repeated studies)
+    with profiling.stage('load_generation'):
+        load, time = cached_community_load_profile(num_houses, daily_kWh_per_house, resolution_steps, seed=seed)
+    if plot:
+        with profiling.stage('plotting'):
+            from plotUtils import plot_load_profile
+            plot_load_profile(time, load, title=f"{num_houses} Houses Community Load (15-min Resolution)")
 
-    # Plot community load profile first
-    load, time = generate_community_load_profile(
-        num_houses=num_houses,
-        daily_kWh_per_house=daily_kWh_per_house,
-        time_steps=resolution_steps
-    )
-    plot_load_profile(time, load, title=f"{num_houses} Houses Community Load (15-min Resolution)")
+    # Run BESS + Supercap simulation and BESS only simulation on the same profile
+    time, load, results_hess, soh_hess = run_simulation(num_houses, daily_kWh_per_house, resolution_steps, dt,
+                                                        use_supercap=True, load_source=[(load, time)],
+                                                        telemetry=telemetry)
+    _, _, results_bess_only, soh_bess_only = run_simulation(num_houses, daily_kWh_per_house, resolution_steps, dt,
+                                                            use_supercap=False, load_source=[(load, time)])
 
-    # Run BESS + Supercap simulation
-    time, load, results_hess, soh_hess = run_simulation(num_houses, daily_kWh_per_house, resolution_steps, dt, use_supercap=True)
+    if not plot:
+        return results_hess, results_bess_only
 
-    # Run BESS only simulation
-    _, _, results_bess_only, soh_bess_only = run_simulation(num_houses, daily_kWh_per_house, resolution_steps, dt, use_supercap=False)
+    with profiling.stage('plotting'):
+        import matplotlib.pyplot as plt
+        from plotUtils import plot_hess_results, show_or_save
 
-    # Plot HESS results (BESS + Supercap)
-    plot_hess_results(time, results_hess)
+        # Plot HESS results (BESS + Supercap)
+        plot_hess_results(time, results_hess)
 
-    # Plot SoH comparison
-    plt.figure(figsize=(10, 6))
-    plt.plot(time, soh_hess, label='BESS + Supercap SoH')
-    plt.plot(time, soh_bess_only, label='BESS Only SoH')
-    plt.xlabel('Time (s)')
-    plt.ylabel('State of Health (SoH)')
-    plt.title('Battery State of Health Over Time')
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+        # Plot SoH comparison
+        plt.figure(figsize=(10, 6))
+        plt.plot(time, soh_hess, label='BESS + Supercap SoH')
+        plt.plot(time, soh_bess_only, label='BESS Only SoH')
+        plt.xlabel('Time (s)')
+        plt.ylabel('State of Health (SoH)')
+        plt.title('Battery State of Health Over Time')
+        plt.legend()
+        plt.grid(True)
+        show_or_save("soh_comparison.png")
+    return results_hess, results_bess_only
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the HBESS simulation.")
+    parser.add_argument('--profile', nargs='?', const='profile.folded', metavar='PATH',
+                        help="print a per-stage time breakdown and write cProfile collapsed stacks "
+                             "to PATH (default profile.folded)")
+    parser.add_argument('--telemetry', nargs='?', const='', metavar='TRACE_PATH',
+                        help="print EMS transient / supercap dispatch counts for the BESS + supercap run; "
+                             "with TRACE_PATH also write its per-step trace there")
+    args = parser.parse_args()
+
+    ems_telemetry = None
+    if args.telemetry is not None:
+        from telemetry import EVENTS, TRACE, EMSTelemetry, TraceSink
+        if args.telemetry:
+            ems_telemetry = EMSTelemetry(TRACE, trace_sink=TraceSink(args.telemetry))
+        else:
+            ems_telemetry = EMSTelemetry(EVENTS)
+    try:
+        if args.profile:
+            profiling.profile_run(main, output=args.profile, telemetry=ems_telemetry)
+        else:
+            main(telemetry=ems_telemetry)
+    finally:
+        if ems_telemetry is not None:
+            ems_telemetry.close()
+    if ems_telemetry is not None:
+        summary = ems_telemetry.summary()
+        print(f"EMS telemetry: {summary['steps']} steps, {summary['transients_detected']} transients, "
+              f"{summary['sc_dispatches']} supercap dispatches")
@@ -0,0 +1,153 @@
+import csv
+import itertools
+import json
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+def _parse_times(column):
+    """Timestamps as float seconds: numeric values pass through, ISO-8601 strings are converted."""
+    try:
+        return np.asarray(column, dtype=np.float64)
+    except ValueError:
+        return np.asarray(column, dtype='datetime64[ms]').astype(np.int64) / 1000.0
+
+
+def _data_rows(f, header):
+    """csv rows of f without the header row and without blank rows."""
+    reader = csv.reader(f)
+    if header:
+        next(reader, None)
+    return (row for row in reader if any(cell.strip() for cell in row))
+
+
+def convert_csv(csv_path, store_dir, time_column=0, load_column=1, load_scale=1.0, header=True, chunk_rows=1_000_000):
+    """
+    One-off conversion of a metered CSV into a memory-mappable store.
+
+    The CSV is read in chunk_rows blocks and written into time.npy (seconds) and
+    load_kw.npy inside store_dir, so the full file is never held in memory.
+
+    Args:
+        csv_path (str): source CSV
+        store_dir (str): output directory
+        time_column (int): column holding timestamps (seconds or ISO-8601)
+        load_column (int): column holding load
+        load_scale (float): multiplier converting the load column to kW (e.g. 1e-3 for W)
+        header (bool): skip the first row
+    """
+    # Counted with the csv reader, not by lines, so quoted newlines and blank rows match the second pass
+    with open(csv_path, newline='') as f:
+        rows = sum(1 for _ in _data_rows(f, header))
+
+    os.makedirs(store_dir, exist_ok=True)
+    time_s = open_memmap(os.path.join(store_dir, 'time.npy'), mode='w+', dtype=np.float64, shape=(rows,))
+    load_kw = open_memmap(os.path.join(store_dir, 'load_kw.npy'), mode='w+', dtype=np.float64, shape=(rows,))
+
+    with open(csv_path, newline='') as f:
+        reader = _data_rows(f, header)
+        pos = 0
+        while True:
+            block = list(itertools.islice(reader, chunk_rows))
+            if not block:
+                break
+            columns = list(zip(*block))
+            time_s[pos:pos + len(block)] = _parse_times(columns[time_column])
+            load_kw[pos:pos + len(block)] = np.asarray(columns[load_column], dtype=np.float64) * load_scale
+            pos += len(block)
+
+    time_s.flush()
+    load_kw.flush()
+    with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+        json.dump({'source': os.path.basename(csv_path), 'samples': pos}, f)
+    return MeteredLoad.open(store_dir)
+
+
+class MeteredLoad:
+    def __init__(self, load_kw, time_s=None, t0=0.0, sample_period=1.0, load_scale=None):
+        """
+        Memory-mapped metered load series.
+
+        Args:
+            load_kw: array-like (usually np.memmap) of load in kW
+            time_s: optional timestamps in seconds; None means uniform sampling
+            t0 (float): start time in seconds when time_s is None
+            sample_period (float): sample spacing in seconds when time_s is None
+            load_scale (float): optional factor to kW, applied per window instead of
+                                copying the whole series
+        """
+        self.load_kw = load_kw
+        self.load_scale = load_scale
+        self.time_s = time_s
+        self.t0 = t0 if time_s is None else float(time_s[0])
+        self.sample_period = sample_period if time_s is None or len(time_s) < 2 else float(time_s[1] - time_s[0])
+
+    @classmethod
+    def open(cls, store_dir):
+        """Open a store written by convert_csv."""
+        load_kw = np.load(os.path.join(store_dir, 'load_kw.npy'), mmap_mode='r')
+        time_s = np.load(os.path.join(store_dir, 'time.npy'), mmap_mode='r')
+        return cls(load_kw, time_s)
+
+    @classmethod
+    def from_raw(cls, path, dtype=np.float32, t0=0.0, sample_period=1.0, load_scale=None):
+        """Memory-map a headerless binary file of uniformly sampled load values."""
+        return cls(np.memmap(path, dtype=dtype, mode='r'), t0=t0, sample_period=sample_period, load_scale=load_scale)
+
+    def __len__(self):
+        return len(self.load_kw)
+
+    def times(self, start, stop):
+        if self.time_s is not None:
+            return self.time_s[start:stop]
+        return self.t0 + np.arange(start, stop) * self.sample_period
+
+    def window(self, start_s, stop_s):
+        """
+        (load_kw, time_s) for samples with start_s <= t < stop_s. The load is a view into
+        the mapped file (no copy) unless a load_scale has to be applied.
+        """
+        if self.time_s is not None:
+            start, stop = np.searchsorted(self.time_s, [start_s, stop_s])
+        else:
+            start = max(0, int(np.ceil((start_s - self.t0) / self.sample_period)))
+            stop = min(len(self), int(np.ceil((stop_s - self.t0) / self.sample_period)))
+        load = self.load_kw[start:stop]
+        if self.load_scale is not None:
+            load = load * self.load_scale
+        return load, self.times(start, stop)
+
+    def chunks(self, dt, chunk_seconds=3600, start_s=None, stop_s=None):
+        """
+        Yields (load_kw, time_hours) chunks resampled to the simulation dt, the format
+        run_simulation(load_source=...) consumes.
+
+        dt equal to the sample period passes windows through; an integer multiple
+        averages blocks of samples; anything else interpolates linearly.
+        """
+        start_s = self.t0 if start_s is None else start_s
+        end_s = float(self.times(len(self) - 1, len(self))[0]) + self.sample_period
+        stop_s = end_s if stop_s is None else min(stop_s, end_s)
+        chunk_seconds = max(dt, chunk_seconds - chunk_seconds % dt)
+        ratio = dt / self.sample_period
+
+        for t_start in np.arange(start_s, stop_s, chunk_seconds):
+            t_stop = min(t_start + chunk_seconds, stop_s)
+            load, time_s = self.window(t_start, t_stop)
+            if len(load) == 0:
+                continue
+
+            if np.isclose(ratio, 1.0):
+                resampled, t_out = load, time_s
+            elif np.isclose(ratio, round(ratio)):
+                factor = int(round(ratio))
+                usable = len(load) - len(load) % factor
+                resampled = np.asarray(load[:usable]).reshape(-1, factor).mean(axis=1)
+                t_out = time_s[:usable:factor]
+            else:
+                t_out = np.arange(t_start, t_stop, dt)
+                resampled = np.interp(t_out, time_s, load)
+
+            if len(resampled):
+                yield resampled, np.asarray(t_out) / 3600  # seconds to hours
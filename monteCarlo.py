@@ -0,0 +1,198 @@
+import math
+import os
+from multiprocessing import Pool
+from statistics import NormalDist
+import numpy as np
+from loadProfile import generate_community_load_profile_batched
+from main import run_simulation
+
+TRIAL_KPIS = ('final_soh', 'final_soc', 'min_soc', 'peak_batt_power_kW')
+
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+class P2Quantile:
+    def __init__(self, p):
+        """
+        Streaming estimate of the p-quantile with the P-squared algorithm (Jain & Chlamtac):
+        five markers whose heights are adjusted parabolically as samples arrive, so memory
+        is constant however many samples are seen.
+        """
+        self.p = p
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        h = self._heights
+        if len(h) < 5:
+            h.append(x)
+            h.sort()
+            return
+
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+
+        n = self._positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the three middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+                if h[i - 1] < parabolic < h[i + 1]:
+                    h[i] = parabolic
+                else:
+                    h[i] += d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    @property
+    def value(self):
+        h = self._heights
+        if not h:
+            return math.nan
+        if len(h) < 5:
+            # Too few samples for the markers: exact quantile of what has been seen
+            return float(np.quantile(h, self.p))
+        return h[2]
+
+
+class RunningStats:
+    def __init__(self, quantiles=QUANTILES):
+        """Welford running mean / variance plus P2Quantile sketches of one KPI."""
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.quantiles = {q: P2Quantile(q) for q in quantiles}
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        for sketch in self.quantiles.values():
+            sketch.add(x)
+
+    @property
+    def variance(self):
+        """Sample variance (nan below two samples)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def ci_width(self, confidence=0.95):
+        """Full width of the normal confidence interval of the mean."""
+        if self.count < 2:
+            return math.inf
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return 2 * z * math.sqrt(self.variance / self.count)
+
+    def summary(self, confidence=0.95):
+        half = self.ci_width(confidence) / 2
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'std': math.sqrt(self.variance) if self.count > 1 else math.nan,
+            'ci_low': self.mean - half,
+            'ci_high': self.mean + half,
+            'quantiles': {q: sketch.value for q, sketch in self.quantiles.items()},
+        }
+
+
+def trial_kpis(results):
+    """KPIs of one run_simulation ResultRecorder, keyed by TRIAL_KPIS."""
+    return {
+        'final_soh': float(results['soh'][-1]),
+        'final_soc': float(results['soc_batt'][-1]),
+        'min_soc': float(np.min(results['soc_batt'])),
+        'peak_batt_power_kW': float(np.max(results['batt_power']) / 1000),
+    }
+
+
+def _run_trial(job):
+    seed_seq, num_houses, daily_kWh_per_house, resolution_steps, dt, sim_kwargs = job
+    # Each trial's profile comes from its own spawned stream, never the global np.random
+    load, time = generate_community_load_profile_batched(num_houses, daily_kWh_per_house, resolution_steps,
+                                                         seed=seed_seq)
+    _, _, results, _ = run_simulation(num_houses, daily_kWh_per_house, resolution_steps, dt,
+                                      load_source=[(load, time)], **sim_kwargs)
+    return trial_kpis(results)
+
+
+def run_monte_carlo(num_houses, daily_kWh_per_house, resolution_steps, dt, seed=None, max_trials=1000,
+                    min_trials=10, ci_width=None, confidence=0.95, kpis=TRIAL_KPIS, processes=None,
+                    **sim_kwargs):
+    """
+    Monte Carlo over synthetic community load profiles.
+
+    Trial i draws its profile from the i-th child of np.random.SeedSequence(seed), so
+    trials are independent, safe to run in parallel and reproducible. Each trial runs
+    run_simulation and only its KPIs are folded, in trial order, into RunningStats;
+    trajectories are never kept. The results are therefore identical for any number of
+    processes.
+
+    Args:
+        seed: root seed (None draws fresh entropy; the entropy used is returned)
+        max_trials (int): trial budget
+        min_trials (int): trials run before the stopping rule is checked
+        ci_width: stop once the confidence interval of the mean is at most this wide for
+                  every KPI in kpis; a float or a dict keyed by KPI. None runs max_trials.
+        confidence (float): confidence level of the interval
+        kpis: KPIs the stopping rule watches (all of TRIAL_KPIS are recorded)
+        processes (int): worker processes (default os.cpu_count(); 1 runs in-process)
+        sim_kwargs: forwarded to run_simulation (use_supercap, degradation, ...)
+
+    Returns:
+        dict with 'trials', 'converged', 'entropy' and 'kpis' (KPI -> RunningStats.summary)
+    """
+    root = np.random.SeedSequence(seed)
+    targets = None
+    if ci_width is not None:
+        targets = ci_width if isinstance(ci_width, dict) else {kpi: ci_width for kpi in kpis}
+    stats = {kpi: RunningStats() for kpi in TRIAL_KPIS}
+
+    def converged():
+        if targets is None or stats[TRIAL_KPIS[0]].count < min_trials:
+            return False
+        return all(stats[kpi].ci_width(confidence) <= width for kpi, width in targets.items())
+
+    jobs = ((child, num_houses, daily_kWh_per_house, resolution_steps, dt, sim_kwargs)
+            for child in root.spawn(max_trials))
+    processes = processes or os.cpu_count() or 1
+
+    done = False
+    if processes == 1:
+        for job in jobs:
+            for kpi, value in _run_trial(job).items():
+                stats[kpi].add(value)
+            if converged():
+                done = True
+                break
+    else:
+        with Pool(processes) as pool:
+            # imap keeps trial order; leaving the block cancels trials still in flight
+            for kpis_of_trial in pool.imap(_run_trial, jobs):
+                for kpi, value in kpis_of_trial.items():
+                    stats[kpi].add(value)
+                if converged():
+                    done = True
+                    break
+
+    return {
+        'trials': stats[TRIAL_KPIS[0]].count,
+        'converged': done,
+        'entropy': root.entropy,
+        'kpis': {kpi: s.summary(confidence) for kpi, s in stats.items()},
+    }
@@ -0,0 +1,263 @@
+import numpy as np
+
+CELL_NOMINAL_VOLTAGE = 3.7  # V
+CELL_CUTOFF_VOLTAGE = 3.0   # V, lowest allowed cell terminal voltage
+
+
+def cell_ocv(soc):
+    """Open-circuit voltage (V) of one NMC-like cell at state of charge soc (0..1)."""
+    soc = np.clip(soc, 0.0, 1.0)
+    return 3.4 + 0.8 * soc - 0.25 * np.exp(-15 * soc) + 0.05 * np.exp(-10 * (1 - soc))
+
+
+class CellPack:
+    # Mutable state saved by checkpoint.py in place of batteryModel.Battery's lumped fields
+    STATE_FIELDS = ('charge_Ah', 'cell_capacity_Ah', 'v_rc', 'cell_current', '_soh', 'cycle_energy_throughput',
+                    'current')
+
+    def __init__(self, capacity, voltage, discharge_rate, soc_init=1.0, n_parallel=40, r0=0.0015, r1=0.001,
+                 c1=20000, capacity_spread=0.0, resistance_spread=0.0, seed=None, balance_current_A=0.0,
+                 balance_threshold=0.01, ocv=cell_ocv, cutoff_voltage=CELL_CUTOFF_VOLTAGE, table=None,
+                 temperature_C=25.0):
+        """
+        Battery pack resolved to individual Thevenin (R0 + R1||C1) cells, a drop-in for
+        batteryModel.Battery.
+
+        The pack is n_series groups of n_parallel cells, with n_series chosen so the pack
+        reaches voltage at CELL_NOMINAL_VOLTAGE per cell and the cell capacity so it stores
+        capacity kWh. Every per-cell quantity is a (n_series, n_parallel) array and each
+        discharge() advances all cells in one vectorised step:
+        - parallel cells share their group voltage, so current splits by each cell's
+          open-circuit voltage and R0 (circulating currents included);
+        - the pack current is the one that delivers the requested power through the
+          series groups' combined EMF and resistance;
+        - it is then capped so no cell is emptied or pulled below cutoff_voltage, so the
+          weakest cell sets the pack limit (limiting_cell records which one);
+        - RC branches advance with the exact zero-order-hold update (as plotResponse's
+          'exact' solver); see _cell_sources for how each step stays stable.
+
+        Args:
+            capacity (float): pack energy in kWh
+            voltage (float): nominal pack voltage
+            discharge_rate (float): max discharge power in kW
+            soc_init (float): initial state of charge of every cell
+            n_parallel (int): cells in parallel per series group
+            r0, r1 (float): cell ohmic and polarisation resistance (Ohm)
+            c1 (float): cell polarisation capacitance (F)
+            capacity_spread, resistance_spread (float): relative standard deviation of
+                cell capacity and resistance (manufacturing spread), drawn with seed
+            balance_current_A (float): passive balancing bleed current per series group;
+                groups more than balance_threshold above the lowest group SoC are bled.
+                0 disables balancing.
+            ocv (callable): cell open-circuit voltage as a function of SoC arrays
+            cutoff_voltage (float): minimum cell terminal voltage
+            table (lookupTables.VoltageTable): precomputed cell OCV, OCV slope and
+                R(SoC, T) factor; replaces ocv, and scales r0 by the factor at
+                temperature_C. Each step is then a few batched interpolations.
+        """
+        self.n_series = max(1, int(round(voltage / CELL_NOMINAL_VOLTAGE)))
+        self.n_parallel = int(n_parallel)
+        shape = (self.n_series, self.n_parallel)
+        rng = np.random.default_rng(seed)
+
+        def spread(value, sigma):
+            return value * np.clip(1 + sigma * rng.standard_normal(shape), 0.5, 1.5) if sigma else np.full(shape, value)
+
+        cell_Ah = capacity * 1000 / (self.n_series * self.n_parallel * CELL_NOMINAL_VOLTAGE)
+        self.new_capacity_Ah = spread(cell_Ah, capacity_spread)  # as-new capacity per cell
+        self.cell_capacity_Ah = self.new_capacity_Ah.copy()
+        self.charge_Ah = self.cell_capacity_Ah * np.clip(soc_init, 0.0, 1.0)
+        self.r0 = spread(r0, resistance_spread)
+        self.r1 = spread(r1, resistance_spread)
+        self.c1 = np.full(shape, float(c1))
+        self.v_rc = np.zeros(shape)
+        self.cell_current = np.zeros(shape)
+        if table is not None:
+            ocv = table.ocv
+        self.group_voltage = ocv(self.cell_soc).mean(axis=1)
+
+        self.ocv = ocv
+        self.table = table
+        self.temperature_C = temperature_C
+        self.cutoff_voltage = cutoff_voltage
+        self.balance_current_A = balance_current_A
+        self.balance_threshold = balance_threshold
+
+        # Pack-level attributes of batteryModel.Battery
+        self.voltage = voltage
+        self.nominal_capacity = capacity
+        self.discharge_rate = discharge_rate * 10**3
+        self.discharge_efficiency = 0.90  # kept for compatibility; losses are modelled by R0/R1
+        self.cycle_energy_throughput = 0.0
+        self.current = 0.0
+        self.limiting_cell = None  # (series, parallel) index of the cell that capped the last step
+        self._soh = 1.0
+
+    @property
+    def cell_soc(self):
+        return self.charge_Ah / self.cell_capacity_Ah
+
+    @property
+    def soc(self):
+        """Usable pack SoC: that of the emptiest series group."""
+        return float(np.min(self.charge_Ah.sum(axis=1) / self.cell_capacity_Ah.sum(axis=1)))
+
+    @soc.setter
+    def soc(self, value):
+        self.remaining_capacity = value * self.capacity
+
+    @property
+    def soh(self):
+        return self._soh
+
+    @soh.setter
+    def soh(self, value):
+        # Capacity fade applies to every cell; charge above the faded capacity is lost
+        self._soh = max(0.0, value)
+        self.cell_capacity_Ah = self.new_capacity_Ah * self._soh
+        np.minimum(self.charge_Ah, self.cell_capacity_Ah, out=self.charge_Ah)
+
+    @property
+    def capacity(self):
+        return self.nominal_capacity * self._soh
+
+    @capacity.setter
+    def capacity(self, value):
+        self.soh = value / self.nominal_capacity
+
+    @property
+    def remaining_capacity(self):
+        """Usable energy (kWh) at the current SoC."""
+        return self.soc * self.capacity
+
+    @remaining_capacity.setter
+    def remaining_capacity(self, value):
+        current = self.remaining_capacity
+        if current > 0 and value != current:
+            self.charge_Ah = np.minimum(self.charge_Ah * (max(0.0, value) / current), self.cell_capacity_Ah)
+
+    def _cell_sources(self, dt):
+        """
+        Each cell as a step-averaged source: mean terminal voltage over dt is
+        emf - i * r for a current i held over the step, with
+
+        - the RC branch's exact response folded in (its initial voltage decays by
+          tau / dt * (1 - e^(-dt/tau)) on average, the rest acts like a resistance), and
+        - the OCV drop from the charge the step removes, linearised about the present
+          SoC, also as a resistance.
+
+        Treating both implicitly keeps circulating currents between unequal parallel
+        cells stable at large dt.
+        """
+        soc = self.cell_soc
+        tau = self.r1 * self.c1
+        decay = np.exp(-dt / tau)
+        held = tau / dt * (1 - decay)  # mean fraction of the initial v_rc over the step
+        if self.table is None:
+            h = 1e-4
+            slope = (self.ocv(soc + h) - self.ocv(soc - h)) / (2 * h)  # V per unit SoC
+            r0 = self.r0
+        else:
+            slope = self.table.ocv_slope(soc)
+            r0 = self.r0 * self.table.resistance_factor(soc, self.temperature_C)
+        emf = self.ocv(soc) - self.v_rc * held
+        r = r0 + self.r1 * (1 - held) + slope * dt / (2 * 3600 * self.cell_capacity_Ah)
+        return emf, r, decay
+
+    @staticmethod
+    def _group_thevenin(emf, r):
+        # Parallel group of (emf_j, r_j) sources as one source (E_g, R_g)
+        conductance = 1.0 / r
+        group_g = conductance.sum(axis=1)
+        group_emf = (emf * conductance).sum(axis=1) / group_g
+        return group_emf, 1.0 / group_g
+
+    def _max_current(self, emf, r, group_emf, group_r, dt):
+        # Cell current is linear in pack current I: i = (emf - E_g) / r + I * R_g / r
+        offset = (emf - group_emf[:, None]) / r
+        gain = group_r[:, None] / r
+        # No cell may draw more charge than it holds this step ...
+        charge_limit = (self.charge_Ah * 3600 / dt - offset) / gain
+        # ... nor may any group fall below the cut-off voltage
+        voltage_limit = np.broadcast_to(((group_emf - self.cutoff_voltage) / group_r)[:, None], charge_limit.shape)
+        limits = np.minimum(charge_limit, voltage_limit)
+        index = np.unravel_index(np.argmin(limits), limits.shape)
+        return max(0.0, float(limits[index])), index
+
+    def discharge(self, power_load, dt):
+        emf, r, decay = self._cell_sources(dt)
+        group_emf, group_r = self._group_thevenin(emf, r)
+        pack_emf = group_emf.sum()
+        pack_r = group_r.sum()
+
+        pack_current = 0.0
+        self.limiting_cell = None
+        if power_load > 0 and self.soc > 0:
+            power_load = min(power_load, self.discharge_rate)
+            # P = I * (E - I R); take the smaller root, or the maximum-power current
+            discriminant = pack_emf ** 2 - 4 * pack_r * power_load
+            if discriminant > 0:
+                pack_current = (pack_emf - np.sqrt(discriminant)) / (2 * pack_r)
+            else:
+                pack_current = pack_emf / (2 * pack_r)
+            max_current, index = self._max_current(emf, r, group_emf, group_r, dt)
+            if pack_current > max_current:
+                pack_current = max_current
+                self.limiting_cell = tuple(int(i) for i in index)
+
+        # Parallel cells share their group's voltage
+        self.group_voltage, cell_current = self._split_current(emf, r, group_emf, group_r, pack_current, dt)
+
+        # Exact RC update for a current held over dt
+        self.v_rc = cell_current * self.r1 + (self.v_rc - cell_current * self.r1) * decay
+        self.charge_Ah = self.charge_Ah - cell_current * dt / 3600
+        self._balance(dt)
+
+        self.cell_current = cell_current
+        self.current = float(pack_current)
+        return float(self.group_voltage.sum()), self.current
+
+    def _split_current(self, emf, r, group_emf, group_r, pack_current, dt):
+        """
+        Group voltages and cell currents for pack current pack_current, with every cell
+        kept between empty and full over the step. A cell whose share (circulating
+        currents included) would take it past either bound is held at the current that
+        just reaches it and the rest of its group re-solved without it, so each group
+        carries exactly pack_current and charge is conserved.
+        """
+        g = 1.0 / r
+        most = self.charge_Ah * 3600 / dt  # largest discharge current a cell can sustain
+        least = (self.charge_Ah - self.cell_capacity_Ah) * 3600 / dt  # largest charge current (negative)
+        group_voltage = group_emf - pack_current * group_r
+        cell_current = (emf - group_voltage[:, None]) * g
+        held = np.zeros(emf.shape, dtype=bool)
+        held_current = np.zeros(emf.shape)
+        for _ in range(self.n_parallel):
+            over = ~held & (cell_current > most)
+            under = ~held & (cell_current < least)
+            if not (over.any() or under.any()):
+                break
+            held_current = np.where(over, most, np.where(under, least, held_current))
+            held |= over | under
+            free_g = np.where(held, 0.0, g)
+            free_total = free_g.sum(axis=1)
+            # Free cells carry what the held ones do not: sum g (emf - V) = I - held
+            with np.errstate(divide='ignore', invalid='ignore'):
+                solved = ((free_g * emf).sum(axis=1) - (pack_current - held_current.sum(axis=1))) / free_total
+            group_voltage = np.where(free_total > 0, solved, group_voltage)
+            cell_current = np.where(held, held_current, (emf - group_voltage[:, None]) * g)
+        return group_voltage, cell_current
+
+    def _balance(self, dt):
+        if not self.balance_current_A:
+            return
+        group_soc = self.charge_Ah.sum(axis=1) / self.cell_capacity_Ah.sum(axis=1)
+        bleed = group_soc > group_soc.min() + self.balance_threshold
+        if bleed.any():
+            # The group's bleed current is shared by its cells in proportion to capacity
+            share = self.cell_capacity_Ah[bleed] / self.cell_capacity_Ah[bleed].sum(axis=1, keepdims=True)
+            self.charge_Ah[bleed] = np.maximum(0.0, self.charge_Ah[bleed] - self.balance_current_A * share * dt / 3600)
+
+    def cell_voltages(self):
+        """Mean terminal voltage of every cell over the last step, (n_series, n_parallel)."""
+        return np.broadcast_to(self.group_voltage[:, None], self.charge_Ah.shape)
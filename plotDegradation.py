@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
 class Battery:
@@ -55,7 +54,115 @@ def simulate_degradation(battery, avg_soc, cycle_energy_kWh, max_cycles=3000):
             break
     return cycles, sohs
 
+def _soc_factors(avg_soc, hbess):
+    # Cycle-independent part of Battery.degrade, evaluated once per lane
+    if_hbess_soc = np.where(avg_soc <= 0.5, 1.0 + 1.0 * avg_soc, np.where(avg_soc <= 0.75, 1.5, 1.7))
+    if_bess_soc = np.select([avg_soc <= 0.25, avg_soc <= 0.5, avg_soc <= 0.75], [1.0, 1.2, 1.5], 1.7)
+    soc_factor = np.where(hbess, if_hbess_soc, if_bess_soc)
+
+    hbess_diff = 1 + 0.7 * np.exp(4.4 * (avg_soc - 0.5))
+    bess_diff = np.minimum(0.8 + 0.5 * np.exp(5 * (avg_soc - 0.7)), 10)
+    return soc_factor * np.where(hbess, hbess_diff, bess_diff)
+
+
+def simulate_degradation_grid(avg_soc, degradation_factor, cycle_energy_kWh, hbess, capacity_kWh=100,
+                              max_cycles=3000, end_of_life=0.2, keep_trajectories=True):
+    """
+    Vectorised simulate_degradation over many lanes at once.
+
+    All arguments broadcast against each other; every lane follows Battery.degrade and
+    stops at its end-of-life threshold. The SoC-dependent factors (and their np.exp)
+    are computed once per lane, so each cycle costs a few array operations.
+
+    Returns:
+        sohs: (max_cycles, *lane_shape) SoH after each cycle, NaN once a lane has stopped;
+              None with keep_trajectories=False, which only tracks cycle_life
+        cycle_life: lane_shape array, first cycle index with SoH <= end_of_life
+                    (max_cycles if the lane never gets there)
+    """
+    avg_soc, factor, energy, hbess = np.broadcast_arrays(np.asarray(avg_soc, dtype=float),
+                                                         np.asarray(degradation_factor, dtype=float),
+                                                         np.asarray(cycle_energy_kWh, dtype=float),
+                                                         np.asarray(hbess, dtype=bool))
+    base = energy * factor * _soc_factors(avg_soc, hbess)
+
+    capacity = np.full(avg_soc.shape, float(capacity_kWh))
+    soh = np.ones(avg_soc.shape)
+    active = np.ones(avg_soc.shape, dtype=bool)
+    cycle_life = np.full(avg_soc.shape, max_cycles)
+    sohs = np.full((max_cycles,) + avg_soc.shape, np.nan) if keep_trajectories else None
+
+    for cycle in range(max_cycles):
+        wear_factor = np.where(hbess, 1 + 2 * (1 - soh), 1 + 10 * (1 - soh) ** 3)
+        capacity = np.where(active, np.maximum(0, capacity - base * wear_factor), capacity)
+        soh = capacity / capacity_kWh
+        if sohs is not None:
+            sohs[cycle, ...] = np.where(active, soh, np.nan)
+
+        ended = active & (soh <= end_of_life)
+        cycle_life[ended] = cycle
+        active &= ~ended
+        if not active.any():
+            if sohs is not None:
+                sohs = sohs[:cycle + 1]
+            break
+
+    return sohs, cycle_life
+
+
+def _interp_nd(axes, values, points):
+    # Multilinear interpolation on a regular grid; points has shape (..., len(axes))
+    points = np.asarray(points, dtype=float)
+    lower, weight = [], []
+    for d, axis in enumerate(axes):
+        x = np.clip(points[..., d], axis[0], axis[-1])
+        i = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, max(len(axis) - 2, 0))
+        span = axis[np.minimum(i + 1, len(axis) - 1)] - axis[i]
+        lower.append(i)
+        weight.append(np.where(span > 0, (x - axis[i]) / np.where(span > 0, span, 1), 0.0))
+
+    result = np.zeros(points.shape[:-1])
+    for corner in np.ndindex(*(2,) * len(axes)):
+        w = np.ones(points.shape[:-1])
+        index = []
+        for d, bit in enumerate(corner):
+            w = w * (weight[d] if bit else 1 - weight[d])
+            index.append(np.minimum(lower[d] + bit, len(axes[d]) - 1))
+        result += w * values[tuple(index)]
+    return result
+
+
+class CycleLifeSurface:
+    def __init__(self, soc_levels, degradation_factors, cycle_energies_kWh, capacity_kWh=100,
+                 max_cycles=3000, end_of_life=0.2):
+        """
+        Cycle life to end_of_life over an avg SoC x degradation_factor x cycle energy grid,
+        for BESS and HBESS, computed once with simulate_degradation_grid.
+
+        Lookups interpolate linearly between grid points; Battery.degrade's SoC factor is
+        piecewise, so keep grid points on either side of its 0.25/0.5/0.75 breaks.
+        """
+        self.axes = [np.asarray(soc_levels, dtype=float),
+                     np.asarray(degradation_factors, dtype=float),
+                     np.asarray(cycle_energies_kWh, dtype=float)]
+        soc, factor, energy, hbess = np.meshgrid(*self.axes, [False, True], indexing='ij')
+        _, cycle_life = simulate_degradation_grid(soc, factor, energy, hbess, capacity_kWh, max_cycles, end_of_life,
+                                                  keep_trajectories=False)
+        self.bess = cycle_life[..., 0]
+        self.hbess = cycle_life[..., 1]
+
+    def query(self, avg_soc, degradation_factor, cycle_energy_kWh, hbess=False):
+        """Interpolated cycle life; arguments broadcast like NumPy arrays."""
+        points = np.stack(np.broadcast_arrays(np.asarray(avg_soc, dtype=float),
+                                              np.asarray(degradation_factor, dtype=float),
+                                              np.asarray(cycle_energy_kWh, dtype=float)), axis=-1)
+        return _interp_nd(self.axes, self.hbess if hbess else self.bess, points)
+
+
 def plot_degradation():
+    import matplotlib.pyplot as plt
+    from plotUtils import show_or_save
+
     soc_levels = [0.25, 0.50, 0.75, 0.90]
     colors = ['green', 'blue', 'orange', 'red']
 
@@ -66,12 +173,15 @@ def plot_degradation():
 
     plt.figure(figsize=(14, 6))
 
+    # Every SoC level for BESS and HBESS in one vectorised run
+    sohs, cycle_life = simulate_degradation_grid(np.array(soc_levels)[:, None], [bess_factor, hbess_factor],
+                                                 cycle_energy_kWh, [False, True])
+
     # Plot BESS
     plt.subplot(1, 2, 1)
-    for soc, color in zip(soc_levels, colors):
-        bess = Battery("BESS", 100, bess_factor, hbess=False)
-        cycles, sohs = simulate_degradation(bess, soc, cycle_energy_kWh)
-        plt.plot(cycles, sohs, label=f"SoC {int(soc*100)}%", color=color)
+    for i, (soc, color) in enumerate(zip(soc_levels, colors)):
+        n = min(cycle_life[i, 0] + 1, len(sohs))
+        plt.plot(np.arange(n), sohs[:n, i, 0], label=f"SoC {int(soc*100)}%", color=color)
 
     plt.title("BESS - Battery Health vs. Cycles")
     plt.xlabel("Cycle Count")
@@ -82,10 +192,9 @@ def plot_degradation():
 
     # Plot HBESS
     plt.subplot(1, 2, 2)
-    for soc, color in zip(soc_levels, colors):
-        hbess = Battery("HBESS", 100, hbess_factor, hbess=True)
-        cycles, sohs = simulate_degradation(hbess, soc, cycle_energy_kWh)
-        plt.plot(cycles, sohs, label=f"SoC {int(soc*100)}%", color=color)
+    for i, (soc, color) in enumerate(zip(soc_levels, colors)):
+        n = min(cycle_life[i, 1] + 1, len(sohs))
+        plt.plot(np.arange(n), sohs[:n, i, 1], label=f"SoC {int(soc*100)}%", color=color)
 
     plt.title("HBESS - Battery Health vs. Cycles")
     plt.xlabel("Cycle Count")
@@ -95,7 +204,7 @@ def plot_degradation():
     plt.grid(True)
 
     plt.tight_layout()
-    plt.show()
+    show_or_save("batthealth_vs_cycles.png")
 
 if __name__ == "__main__":
     plot_degradation()
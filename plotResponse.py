@@ -1,8 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 class Battery:
-    def __init__(self, capacity_kWh, voltage_nominal, discharge_rate_W, soc_init=1.0, r0=0.01, r1=0.05, c1=5000):
+    def __init__(self, capacity_kWh, voltage_nominal, discharge_rate_W, soc_init=1.0, r0=0.01, r1=0.05, c1=5000,
+                 solver='euler'):
+        self.solver = solver      # 'euler' (forward Euler) or 'exact' (zero-order-hold exponential) RC update
         self.voltage_nominal = voltage_nominal
         self.r0 = r0              # Ohmic internal resistance (Ohms)
         self.r1 = r1              # Polarization resistance (Ohms)
@@ -26,9 +27,14 @@ class Battery:
         # Estimate initial current
         current_A = power_load_W / self.voltage_nominal
         
-        # Update v_rc using Euler integration: dv_rc/dt = (-1/(R1*C1)) * v_rc + (1/C1) * I
-        dv_rc = (-1/(self.r1 * self.c1) * self.v_rc + current_A / self.c1) * dt_s
-        self.v_rc += dv_rc
+        if self.solver == 'exact':
+            # Closed-form solution of the RC branch for a current held constant over dt
+            decay = np.exp(-dt_s / (self.r1 * self.c1))
+            self.v_rc = current_A * self.r1 + (self.v_rc - current_A * self.r1) * decay
+        else:
+            # Update v_rc using Euler integration: dv_rc/dt = (-1/(R1*C1)) * v_rc + (1/C1) * I
+            dv_rc = (-1/(self.r1 * self.c1) * self.v_rc + current_A / self.c1) * dt_s
+            self.v_rc += dv_rc
         
         # Terminal voltage with transient effect
         terminal_voltage = max(0, self.voltage_nominal - current_A * self.r0 - self.v_rc)
@@ -47,49 +53,150 @@ class Battery:
         self.current = current_A
         return terminal_voltage, current_A
 
-# Simulation parameters
-dt = 0.1  # time step in seconds
-total_time = 300  # total simulation time in seconds (5 minutes)
-time_steps = int(total_time / dt)
-
-# Create battery instance
-battery = Battery(capacity_kWh=1.0, voltage_nominal=48, discharge_rate_W=2000, r0=0.01, r1=0.05, c1=5000)
-
-# Prepare arrays for storing results
-time_array = np.linspace(0, total_time, time_steps)
-voltage_array = np.zeros(time_steps)
-current_array = np.zeros(time_steps)
-power_load_array = np.zeros(time_steps)
-
-# Define power load profile: step load starting at 10 seconds
-for i in range(time_steps):
-    t = i * dt
-    if t < 10:
-        power_load_array[i] = 100  # 100 W idle load
-    else:
-        power_load_array[i] = 1500  # Step up to 1500 W load
-
-# Run simulation
-for i in range(time_steps):
-    voltage, current = battery.discharge(power_load_array[i], dt)
-    voltage_array[i] = voltage
-    current_array[i] = current
-
-# Plot results
-plt.figure(figsize=(12, 6))
-plt.subplot(2,1,1)
-plt.plot(time_array, power_load_array, label='Power Load (W)', color='orange')
-plt.ylabel('Power Load (W)')
-plt.legend()
-plt.grid(True)
-
-plt.subplot(2,1,2)
-plt.plot(time_array, voltage_array, label='Terminal Voltage (V)')
-plt.xlabel('Time (s)')
-plt.ylabel('Voltage (V)')
-plt.legend()
-plt.grid(True)
-
-plt.suptitle("Battery Terminal Voltage Response with Transient RC Model")
-plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-plt.show()
+    def simulate(self, power_load_W, dt_s, tol=0.0):
+        """
+        Event-driven run of the exact RC discretisation over a sampled load.
+
+        Samples whose load stays within tol (W) of the first sample of their run form
+        one constant-load segment (at its mean load, so off by at most tol), which is
+        advanced in closed form: v_rc relaxes
+        geometrically towards I*R1 and the remaining energy falls linearly. Python work
+        is therefore proportional to the number of load changes, not samples. With
+        tol=0 the result equals calling discharge() per sample with solver='exact' (up to
+        floating-point rounding of the step on which the battery empties).
+
+        Returns:
+            terminal_voltage, current: arrays with one value per sample
+        """
+        power_load_W = np.asarray(power_load_W, dtype=float)
+        n = len(power_load_W)
+        voltage = np.full(n, float(self.voltage_nominal))
+        current = np.zeros(n)
+
+        bounds = _segment_bounds(power_load_W, tol)
+        decay = np.exp(-dt_s / (self.r1 * self.c1))
+
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            power_W = min(power_load_W[start:stop].mean(), self.discharge_rate_W)
+            if power_W <= 0 or self.soc <= 0:
+                self.current = 0
+                continue
+
+            # Steps taken before the remaining energy runs out (SoC > 0 at the start of a step)
+            energy_step_kWh = (power_W * dt_s) / (3600 * 1000)
+            active = min(stop - start, int(np.ceil(self.remaining_capacity_kWh / energy_step_kWh)))
+            k = np.arange(1, active + 1)
+
+            current_A = power_W / self.voltage_nominal
+            v_inf = current_A * self.r1
+            v_rc = v_inf + (self.v_rc - v_inf) * decay ** k
+
+            terminal_voltage = np.maximum(0, self.voltage_nominal - current_A * self.r0 - v_rc)
+            voltage[start:start + active] = terminal_voltage
+            safe_voltage = np.where(terminal_voltage > 0, terminal_voltage, 1.0)
+            current[start:start + active] = np.where(terminal_voltage > 0, power_W / safe_voltage, 0)
+
+            self.v_rc = v_rc[-1]
+            self.remaining_capacity_kWh = max(0, self.remaining_capacity_kWh - active * energy_step_kWh)
+            self.soc = self.remaining_capacity_kWh / self.capacity_kWh
+            self.current = current[start + active - 1]
+
+        return voltage, current
+
+
+def _segment_bounds(power_load_W, tol):
+    """Start indices of constant-load segments plus n; see Battery.simulate."""
+    n = len(power_load_W)
+    if tol <= 0:
+        breaks = np.flatnonzero(np.diff(power_load_W) != 0) + 1
+        return np.concatenate(([0], breaks, [n]))
+
+    bounds = [0]
+    start = 0
+    while start < n:
+        # Search windows of doubling width, so each segment costs O(its length)
+        width = 64
+        while True:
+            stop = min(n, start + width)
+            away = np.flatnonzero(np.abs(power_load_W[start + 1:stop] - power_load_W[start]) > tol)
+            if away.size:
+                start += 1 + int(away[0])
+                break
+            if stop == n:
+                start = n
+                break
+            width *= 2
+        bounds.append(start)
+    return np.asarray(bounds)
+
+
+def compare_solvers(battery_kwargs, power_load_W, dt_s, tol=0.0):
+    """
+    Regression check of the adaptive exact solver against the fixed-step Euler loop.
+
+    Returns the maximum absolute terminal-voltage difference (V) over the profile.
+    """
+    reference = Battery(**battery_kwargs)
+    v_euler = np.array([reference.discharge(p, dt_s)[0] for p in power_load_W])
+    v_exact, _ = Battery(**battery_kwargs).simulate(power_load_W, dt_s, tol)
+    return np.max(np.abs(v_exact - v_euler))
+
+
+def simulate_step_response(dt=0.1, total_time=300, step_time=10, idle_W=100, step_W=1500):
+    """
+    Terminal voltage of a 1 kWh, 48 V battery for a load stepping from idle_W to step_W
+    at step_time seconds.
+
+    Returns:
+        time, power_load, voltage, current arrays
+    """
+    time_steps = int(total_time / dt)
+
+    # Create battery instance
+    battery = Battery(capacity_kWh=1.0, voltage_nominal=48, discharge_rate_W=2000, r0=0.01, r1=0.05, c1=5000)
+
+    # Prepare arrays for storing results
+    time_array = np.linspace(0, total_time, time_steps)
+    voltage_array = np.zeros(time_steps)
+    current_array = np.zeros(time_steps)
+
+    # Define power load profile: step load starting at step_time seconds
+    power_load_array = np.where(np.arange(time_steps) * dt < step_time, idle_W, step_W).astype(float)
+
+    # Run simulation
+    for i in range(time_steps):
+        voltage, current = battery.discharge(power_load_array[i], dt)
+        voltage_array[i] = voltage
+        current_array[i] = current
+
+    return time_array, power_load_array, voltage_array, current_array
+
+
+def plot_step_response(dt=0.1, total_time=300):
+    import matplotlib.pyplot as plt
+    from plotUtils import show_or_save
+
+    time_array, power_load_array, voltage_array, _ = simulate_step_response(dt, total_time)
+
+    # Plot results
+    plt.figure(figsize=(12, 6))
+    plt.subplot(2,1,1)
+    plt.plot(time_array, power_load_array, label='Power Load (W)', color='orange')
+    plt.ylabel('Power Load (W)')
+    plt.legend()
+    plt.grid(True)
+
+    plt.subplot(2,1,2)
+    plt.plot(time_array, voltage_array, label='Terminal Voltage (V)')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Voltage (V)')
+    plt.legend()
+    plt.grid(True)
+
+    plt.suptitle("Battery Terminal Voltage Response with Transient RC Model")
+    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
+    show_or_save("step_response.png")
+
+
+if __name__ == "__main__":
+    plot_step_response()
@@ -1,23 +1,90 @@
+import os
+from multiprocessing import Pool
 import numpy as np
 import matplotlib.pyplot as plt
+from loadSpectrum import welch_psd
 
-def plot_load_profile(time_vector, load_vector, title="Community Load Profile"):
+# Headless output; untracked, so generated figures never overwrite the report figures in figs/
+FIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'figs_out')
+MAX_PLOT_POINTS = 4000  # per trace, after decimation
+
+_headless = False
+
+
+def set_headless(output_dir=FIG_DIR):
+    """Switch to the non-interactive Agg backend; figures are then saved to output_dir instead of shown."""
+    global _headless, FIG_DIR
+    plt.switch_backend('Agg')
+    _headless = True
+    FIG_DIR = output_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+
+def show_or_save(filename):
+    """Show the current figure, or save it to FIG_DIR/filename and close it when headless."""
+    if _headless:
+        plt.savefig(os.path.join(FIG_DIR, filename), dpi=150)
+        plt.close()
+    else:
+        plt.show()
+
+
+def decimate_minmax(x, y, max_points=MAX_PLOT_POINTS):
+    """
+    Reduce (x, y) to at most max_points samples by keeping the min and max of each
+    bucket, so spikes and dips survive the downsampling. Short inputs pass through.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if n <= max_points:
+        return x, y
+
+    # Split into equal buckets (the last one padded with its final value) and keep each bucket's extremes
+    buckets = max_points // 2
+    size = -(-n // buckets)
+    padded = np.concatenate([y, np.full(size * buckets - n, y[-1])]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    idx = np.concatenate([offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)])
+    idx = np.unique(np.minimum(idx, n - 1))
+    return x[idx], y[idx]
+
+
+def render_batch(jobs, processes=None, output_dir=None):
+    """
+    Render several figures headlessly in worker processes.
+
+    Args:
+        jobs: list of (plot_function, args, kwargs), e.g.
+              [(plot_load_profile, (time, load), {'filename': 'load.png'})]
+        processes (int): worker processes (default os.cpu_count())
+        output_dir (str): where figures are written (default FIG_DIR)
+    """
+    with Pool(processes, initializer=set_headless, initargs=(output_dir or FIG_DIR,)) as pool:
+        pool.starmap(_render_job, jobs)
+
+
+def _render_job(function, args, kwargs):
+    function(*args, **kwargs)
+
+
+def plot_load_profile(time_vector, load_vector, title="Community Load Profile", filename="load_profile.png"):
     plt.figure(figsize=(10, 5))
-    plt.plot(time_vector, load_vector, label='Load (kW)', color='tab:blue')
+    plt.plot(*decimate_minmax(time_vector, load_vector), label='Load (kW)', color='tab:blue')
     plt.title(title)
     plt.xlabel("Time of Day (Hours)")
     plt.ylabel("Power (kW)")
     plt.grid(True)
     plt.legend()
     plt.tight_layout()
-    plt.show()
+    show_or_save(filename)
 
-def plot_hess_results(time_vector, results):
+def plot_hess_results(time_vector, results, filename="hess_results.png"):
     plt.figure(figsize=(12, 12))  # extra height for 4 subplots
 
     # --- Subplot 1: Power Distribution ---
     plt.subplot(3, 1, 1)
-    plt.plot(time_vector, [p/1000 for p in results['load_power']], label='Load (kW)', color='tab:blue')
+    plt.plot(*decimate_minmax(time_vector, np.asarray(results['load_power']) / 1000), label='Load (kW)', color='tab:blue')
     # plt.plot(time_vector, [-p/1000 for p in results['sc_power']], label='Supercap Power (kW)', color='tab:orange')
     # plt.plot(time_vector, [-p/1000 for p in results['batt_power']], label='Battery Power (kW)', color='tab:green')
     plt.title("Power Distribution")
@@ -27,7 +94,8 @@ def plot_hess_results(time_vector, results):
 
     # --- Subplot 2: Battery SoC, P, and Q ---
     plt.subplot(3, 1, 2)
-    plt.plot(time_vector, results['soc_batt'], marker='o', linestyle='-')
+    soc_time, soc = decimate_minmax(time_vector, results['soc_batt'])
+    plt.plot(soc_time, soc, marker='o' if len(soc) <= 500 else None, linestyle='-')
     plt.xlabel("Time of Day (Hours)")
     plt.ylabel("State of Charge (%)")
     plt.title("Battery Voltage vs Time")
@@ -35,7 +103,7 @@ def plot_hess_results(time_vector, results):
 
     # --- Subplot 3: Supercapacitor Voltage ---
     plt.subplot(3, 1, 3)
-    plt.plot(time_vector, results['v_sc'], label='Supercap Voltage (V)', color='tab:orange')
+    plt.plot(*decimate_minmax(time_vector, results['v_sc']), label='Supercap Voltage (V)', color='tab:orange')
     plt.xlabel("Time of Day (Hours)")
     plt.ylabel("Voltage (V)")
     plt.title("Supercapacitor Voltage")
@@ -43,31 +111,35 @@ def plot_hess_results(time_vector, results):
     plt.legend()
 
     plt.tight_layout()
-    plt.show()
-
-def plot_load_fft(load_vector, dt, title="FFT of Load Profile"):
-    # Number of samples
-    n = len(load_vector)
-
-    # Compute FFT
-    fft_vals = np.fft.fft(load_vector)
-    fft_freq = np.fft.fftfreq(n, dt)
+    show_or_save(filename)
 
-    # Take only positive frequencies (real signals)
-    pos_mask = fft_freq >= 0
-    freqs = fft_freq[pos_mask]
-    magnitudes = np.abs(fft_vals[pos_mask]) * 2 / n  # Normalize amplitude
+def plot_load_fft(load_vector, dt, title="Load Power Spectral Density", filename="load_fft.png", segment_length=4096,
+                  cutoff_hz=None):
+    """
+    Welch PSD of the load (see loadSpectrum.WelchPSD), computed chunk by chunk so it works
+    on year-long records. With cutoff_hz the share of fluctuation power above the cutoff
+    is shown and returned.
+    """
+    estimator = welch_psd(load_vector, dt, segment_length)
+    freqs, psd = estimator.psd()
 
     plt.figure(figsize=(10, 5))
-    plt.stem(freqs, magnitudes)  # Removed use_line_collection
+    plt.semilogy(freqs[1:], psd[1:])  # skip DC, removed by the per-segment detrend
+    split = None
+    if cutoff_hz is not None:
+        split = estimator.energy_split(cutoff_hz)
+        plt.axvline(cutoff_hz, color='r', linestyle='--',
+                    label=f"{split['fraction_above'] * 100:.1f}% of power above {cutoff_hz:g} Hz")
+        plt.legend()
     plt.xlabel("Frequency (Hz)")
-    plt.ylabel("Magnitude")
+    plt.ylabel("PSD (kW²/Hz)")
     plt.title(title)
     plt.grid(True)
     plt.tight_layout()
-    plt.show()
+    show_or_save(filename)
+    return split
 
-def plot_performance_degradation(time, soh_hess, soh_bess_only):
+def plot_performance_degradation(time, soh_hess, soh_bess_only, filename="performance_degradation.png"):
     """
     Plots State of Health (SoH) over time for HBESS and BESS only.
     :param time: List or array of time points (seconds)
@@ -75,18 +147,18 @@ def plot_performance_degradation(time, soh_hess, soh_bess_only):
     :param soh_bess_only: List or array of SoH values for BESS only (0 to 1)
     """
     plt.figure(figsize=(10, 6))
-    plt.plot(time, soh_hess, label="HBESS (Battery + Supercap)")
-    plt.plot(time, soh_bess_only, label="BESS Only (Battery)")
+    plt.plot(*decimate_minmax(time, soh_hess), label="HBESS (Battery + Supercap)")
+    plt.plot(*decimate_minmax(time, soh_bess_only), label="BESS Only (Battery)")
     plt.xlabel("Time (seconds)")
     plt.ylabel("State of Health (SoH)")
     plt.title("Battery Performance Degradation Over Time")
     plt.legend()
     plt.grid(True)
     plt.tight_layout()
-    plt.show()
+    show_or_save(filename)
 
 
-def plot_cycle_life(time, soh_hess, soh_bess_only, degradation_threshold=0.8):
+def plot_cycle_life(time, soh_hess, soh_bess_only, degradation_threshold=0.8, filename="cycle_life.png"):
     """
     Estimates cycle life based on when SoH crosses degradation threshold (e.g., 80% capacity).
     Plots the degradation curves and marks cycle life points.
@@ -97,10 +169,8 @@ def plot_cycle_life(time, soh_hess, soh_bess_only, degradation_threshold=0.8):
     """
     # Find first index where SoH <= threshold (or last index if never reached)
     def find_cycle_life_index(soh):
-        for i, v in enumerate(soh):
-            if v <= degradation_threshold:
-                return i
-        return len(soh) - 1
+        crossed = np.flatnonzero(np.asarray(soh) <= degradation_threshold)
+        return crossed[0] if len(crossed) else len(soh) - 1
 
     idx_hess = find_cycle_life_index(soh_hess)
     idx_bess = find_cycle_life_index(soh_bess_only)
@@ -109,8 +179,8 @@ def plot_cycle_life(time, soh_hess, soh_bess_only, degradation_threshold=0.8):
     cycle_life_time_bess = time[idx_bess]
 
     plt.figure(figsize=(10, 6))
-    plt.plot(time, soh_hess, label="HBESS (Battery + Supercap)")
-    plt.plot(time, soh_bess_only, label="BESS Only (Battery)")
+    plt.plot(*decimate_minmax(time, soh_hess), label="HBESS (Battery + Supercap)")
+    plt.plot(*decimate_minmax(time, soh_bess_only), label="BESS Only (Battery)")
 
     plt.axhline(y=degradation_threshold, color='r', linestyle='--', label=f'Degradation Threshold ({degradation_threshold*100}%)')
 
@@ -125,4 +195,4 @@ def plot_cycle_life(time, soh_hess, soh_bess_only, degradation_threshold=0.8):
     plt.legend()
     plt.grid(True)
     plt.tight_layout()
-    plt.show()
\ No newline at end of file
+    show_or_save(filename)
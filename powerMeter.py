@@ -0,0 +1,160 @@
+import math
+import numpy as np
+
+class Meter:
+    def __init__(self, name="HBESS Meter", nominal_voltage=480):
+        self.name = name
+        self.nominal_voltage = nominal_voltage
+        self.v_rms = 0.0
+        self.i_rms = 0.0
+        self.p = 0.0  # Active Power (W)
+        self.q = 0.0  # Reactive Power (VAR)
+        self.s = 0.0  # Apparent Power (VA)
+        self.pf = 1.0
+
+    def update(self, voltage_rms, current_rms, phase_angle_deg=0.0):
+        """
+        Update meter readings.
+        
+        :param voltage_rms: RMS line voltage (V)
+        :param current_rms: RMS line current (A)
+        :param phase_angle_deg: phase angle between V and I (degrees)
+        """
+        angle_rad = math.radians(phase_angle_deg)
+
+        self.v_rms = voltage_rms
+        self.i_rms = current_rms
+        self.s = voltage_rms * current_rms  # Apparent Power (S)
+        self.p = self.s * math.cos(angle_rad)  # Active Power (P)
+        self.q = self.s * math.sin(angle_rad)  # Reactive Power (Q)
+        self.pf = math.cos(angle_rad)
+
+    def read(self):
+        return {
+            "V_rms (V)": self.v_rms,
+            "I_rms (A)": self.i_rms,
+            "P (W)": self.p,
+            "Q (VAR)": self.q,
+            "S (VA)": self.s,
+            "Power Factor": self.pf
+        }
+
+
+METER_FIELDS = ('V_rms', 'I_rms', 'P', 'Q', 'S', 'PF')
+
+
+class WaveformMeter:
+    def __init__(self, sample_rate, f_nominal=50.0, cycles=1, phases=3, name="HBESS PCC Meter"):
+        """
+        Three-phase meter working on instantaneous voltage/current samples.
+
+        Per phase, sums of v^2, i^2, v*i and v(t - T/4)*i over a sliding window of
+        `cycles` nominal cycles give V_rms, I_rms, P and Q; the sums are updated in O(1)
+        per sample. Totals are P = sum(P_ph), Q = sum(Q_ph), S = sum(V_ph * I_ph) and
+        PF = P / S. Readings are valid once one full window has been seen (history
+        starts as zeros). Q is positive for lagging (inductive) current.
+
+        Args:
+            sample_rate (float): samples per second
+            f_nominal (float): grid frequency in Hz
+            cycles (int): window length in nominal cycles
+            phases (int): number of phases
+        """
+        self.name = name
+        self.sample_rate = sample_rate
+        self.phases = phases
+        samples_per_cycle = sample_rate / f_nominal
+        self.window = max(1, int(round(cycles * samples_per_cycle)))
+        self.delay = max(1, int(round(samples_per_cycle / 4)))  # quarter cycle, for Q
+
+        self._v = np.zeros((self.window + self.delay, phases))  # voltage ring buffer (longer, for the delayed tap)
+        self._i = np.zeros((self.window, phases))
+        self._sums = np.zeros((4, phases))  # v^2, i^2, v*i, v_delayed*i
+        self._count = 0
+
+    def _readings(self, sums):
+        sv, si, sp, sq = sums / self.window
+        v_rms = np.sqrt(np.maximum(sv, 0.0))
+        i_rms = np.sqrt(np.maximum(si, 0.0))
+        p = sp.sum(axis=-1)
+        s = (v_rms * i_rms).sum(axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pf = np.where(s > 0, p / s, 1.0)
+        return {
+            'V_rms': v_rms.mean(axis=-1),
+            'I_rms': i_rms.mean(axis=-1),
+            'P': p,
+            'Q': sq.sum(axis=-1),
+            'S': s,
+            'PF': pf,
+        }
+
+    def update(self, v, i):
+        """Add one sample per phase (arrays of shape (phases,)); O(1) running-sum update."""
+        v = np.asarray(v, dtype=float)
+        i = np.asarray(i, dtype=float)
+        n_v, n_i = len(self._v), self.window
+        k = self._count
+
+        # Samples leaving the window (the ring slot at k holds the oldest voltage)
+        v_window_old = self._v[(k - self.window) % n_v]
+        v_delay_old = self._v[(k - self.window - self.delay) % n_v]
+        v_delay_new = self._v[(k - self.delay) % n_v]
+        i_old = self._i[k % n_i]
+
+        self._sums[0] += v * v - v_window_old * v_window_old
+        self._sums[1] += i * i - i_old * i_old
+        self._sums[2] += v * i - v_window_old * i_old
+        self._sums[3] += v_delay_new * i - v_delay_old * i_old
+
+        self._v[k % n_v] = v
+        self._i[k % n_i] = i
+        self._count = k + 1
+        return self._readings(self._sums)
+
+    def process(self, v, i, step=1):
+        """
+        Batched meter over whole arrays of shape (samples, phases).
+
+        Returns a dict of METER_FIELDS arrays with one reading every `step` samples
+        (the reading after each kept sample), computed with cumulative sums instead of a
+        Python call per sample. The meter state continues across calls and with update().
+        """
+        v = np.asarray(v, dtype=float).reshape(-1, self.phases)
+        i = np.asarray(i, dtype=float).reshape(-1, self.phases)
+        m = len(v)
+        n_v, n_i = len(self._v), self.window
+        k = self._count
+
+        # History in time order, followed by the new samples
+        v_all = np.concatenate([self._v[(k + np.arange(n_v)) % n_v], v])
+        i_all = np.concatenate([self._i[(k + np.arange(n_i)) % n_i], i])
+        v_now = v_all[self.delay:]                  # aligned with i_all
+        v_delayed = v_all[:n_i + m]                 # delay samples earlier
+
+        def window_sums(x):
+            c = np.concatenate([np.zeros((1, self.phases)), np.cumsum(x, axis=0)])
+            return c[n_i + 1:] - c[1:m + 1]
+
+        sums = np.stack([window_sums(v_now * v_now), window_sums(i_all * i_all),
+                         window_sums(v_now * i_all), window_sums(v_delayed * i_all)], axis=1)
+
+        self._v = v_all[-n_v:].copy()
+        self._i = i_all[-n_i:].copy()
+        self._count = 0
+        self._sums = sums[-1].copy() if m else self._sums
+
+        kept = sums[step - 1::step]
+        return self._readings(np.moveaxis(kept, 1, 0))
+
+    def read(self):
+        """Latest totals, keyed like Meter.read()."""
+        r = self._readings(self._sums)
+        return {
+            "V_rms (V)": float(r['V_rms']),
+            "I_rms (A)": float(r['I_rms']),
+            "P (W)": float(r['P']),
+            "Q (VAR)": float(r['Q']),
+            "S (VA)": float(r['S']),
+            "Power Factor": float(r['PF']),
+        }
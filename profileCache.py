@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+from loadProfile import generate_community_load_profile_batched
+
+FORMAT_VERSION = 2  # layout of the cached .npy entries
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.profile_cache')
+
+
+class ProfileCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=2 * 1024**3):
+        """
+        Content-addressed on-disk store of generated load profiles.
+
+        Each entry is a (2, n) float64 .npy file holding (load_kw, time) and named by the
+        SHA-256 of the generator name, its module's PROFILE_VERSION, FORMAT_VERSION and the
+        parameters, so entries from older generator code are never served. Hits are
+        returned memory-mapped.
+        Entries are evicted least-recently-used first once the directory exceeds max_bytes.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(generator_name, generator_version=None, **params):
+        blob = json.dumps({'generator': generator_name, 'generator_version': generator_version,
+                           'format': FORMAT_VERSION, 'params': params}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            data = np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass  # evicted by another process since the load; the mapped data is still valid
+        return data[0], data[1]
+
+    def put(self, key, load_kw, time):
+        data = np.stack([np.asarray(load_kw, dtype=np.float64), np.asarray(time, dtype=np.float64)])
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, data)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self.evict(keep=key)
+        hit = self.get(key)
+        if hit is None:
+            return data[0], data[1]  # evicted by another process already; serve the in-memory copy
+        return hit
+
+    def get_or_create(self, generator, **params):
+        """Return generator(**params) from the cache, generating and storing it on a miss."""
+        version = getattr(sys.modules.get(generator.__module__), 'PROFILE_VERSION', None)
+        key = self.key(generator.__name__, version, **params)
+        hit = self.get(key)
+        if hit is not None:
+            return hit
+        return self.put(key, *generator(**params))
+
+    def evict(self, keep=None):
+        """Remove least-recently-used entries (except keep) until under max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy') and name != f'{keep}.npy':
+                # Other processes may evict concurrently: entries can vanish at any point
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            try:
+                total += os.path.getsize(self.path(keep))
+            except FileNotFoundError:
+                pass
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+def cached_community_load_profile(num_houses, daily_kWh_per_house, time_steps=96, seed=0, cache=None):
+    """
+    Seeded community load profile (see generate_community_load_profile_batched), served from
+    the on-disk cache when the same parameters and seed were generated before. seed=None
+    draws a fresh profile that is not reproducible, so it bypasses the cache.
+    """
+    if seed is None:
+        return generate_community_load_profile_batched(num_houses, daily_kWh_per_house, time_steps, seed=None)
+    cache = cache or ProfileCache()
+    return cache.get_or_create(generate_community_load_profile_batched, num_houses=num_houses,
+                               daily_kWh_per_house=daily_kWh_per_house, time_steps=time_steps, seed=seed)
@@ -0,0 +1,166 @@
+import cProfile
+import pstats
+from collections import defaultdict
+from contextlib import nullcontext
+from time import perf_counter
+
+# Stage names used by main.run_simulation / main.main
+STAGES = ('load_generation', 'dispatch', 'degradation', 'recording', 'plotting')
+
+_NO_STAGE = nullcontext()
+_active = None  # StageTimer collecting stage times, None when profiling is off
+
+
+class StageTimer:
+    def __init__(self):
+        """
+        Accumulates wall time and call counts per named stage.
+
+        Stages are timed either as blocks (stage()) or per call of a wrapped function or
+        iterator (wrap(), wrap_iter()), which suits per-step work inside the run loop.
+        """
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def add(self, name, seconds, calls=1):
+        self.seconds[name] += seconds
+        self.calls[name] += calls
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def wrap(self, name, function):
+        """function, timed into stage name on every call."""
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, perf_counter() - start)
+        return timed
+
+    def wrap_iter(self, name, iterable):
+        """iterable, with the time spent producing each item timed into stage name."""
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, perf_counter() - start)
+                return
+            self.add(name, perf_counter() - start)
+            yield item
+
+    def report(self, total=None):
+        """Per-stage breakdown as a text table; total (s) adds an 'other' row and shares."""
+        names = [s for s in STAGES if s in self.seconds] + sorted(set(self.seconds) - set(STAGES))
+        timed = sum(self.seconds.values())
+        total = timed if total is None else total
+        lines = [f"{'stage':18s} {'seconds':>10s} {'share':>7s} {'calls':>10s}"]
+        for name in names:
+            share = self.seconds[name] / total if total else 0.0
+            lines.append(f"{name:18s} {self.seconds[name]:10.3f} {share:7.1%} {self.calls[name]:10d}")
+        if total > timed:
+            lines.append(f"{'other':18s} {total - timed:10.3f} {(total - timed) / total:7.1%}")
+        lines.append(f"{'total':18s} {total:10.3f}")
+        return '\n'.join(lines)
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, perf_counter() - self.start)
+
+
+def active():
+    """The StageTimer of the current profile run, or None when profiling is off."""
+    return _active
+
+
+def stage(name):
+    """Context manager timing a block into stage name; a shared no-op when profiling is off."""
+    return _NO_STAGE if _active is None else _active.stage(name)
+
+
+def _frame(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # built-in
+    return f"{name} ({filename.rsplit('/', 1)[-1]}:{line})"
+
+
+def collapsed_stacks(stats, max_depth=64, min_seconds=1e-6):
+    """
+    cProfile data as collapsed stacks ('root;caller;callee microseconds' lines), the
+    input format of flamegraph.pl, speedscope and similar tools.
+
+    cProfile records caller -> callee edges, not whole stacks, so each function's self
+    time is split over the paths into it in proportion to the cumulative time of each
+    incoming edge.
+    """
+    if not isinstance(stats, pstats.Stats):
+        stats = pstats.Stats(stats)
+    entries = stats.stats
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+    roots = [func for func, entry in entries.items() if not entry[4]]
+
+    lines = defaultdict(float)
+
+    def walk(func, path, share):
+        _, _, self_time, cumulative, _ = entries[func]
+        path = path + (_frame(func),)
+        if self_time * share > 0:
+            lines[';'.join(path)] += self_time * share
+        if len(path) >= max_depth or cumulative * share < min_seconds:
+            return  # also bounds the walk on large call graphs
+        for callee, edge_cumulative in callees.get(func, ()):
+            callee_cumulative = entries[callee][3]
+            if callee_cumulative <= 0 or _frame(callee) in path:
+                continue  # skip recursion back into the current path
+            walk(callee, path, share * edge_cumulative / callee_cumulative)
+
+    for root in roots:
+        walk(root, (), 1.0)
+    return [f"{stack} {round(seconds * 1e6)}" for stack, seconds in sorted(lines.items()) if seconds >= min_seconds / 2]
+
+
+def profile_run(function, *args, output='profile.folded', **kwargs):
+    """
+    Run function(*args, **kwargs) with stage timers and cProfile enabled, print the
+    per-stage breakdown and write collapsed stacks to output. Returns the function's
+    result.
+    """
+    global _active
+    timer = StageTimer()
+    profiler = cProfile.Profile()
+    _active = timer
+    start = perf_counter()
+    try:
+        profiler.enable()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            profiler.disable()
+    finally:
+        _active = None
+    elapsed = perf_counter() - start
+
+    print(timer.report(elapsed))
+    if output:
+        with open(output, 'w') as f:
+            f.write('\n'.join(collapsed_stacks(pstats.Stats(profiler))) + '\n')
+        print(f"Collapsed stacks written to {output}")
+    return result
@@ -0,0 +1,97 @@
+import math
+
+
+def soc_cycle_damage(depth, mean_soc, count, cycles_to_eol=3000, exponent=1.5, eol_fade=0.2, soc_stress=1.0):
+    """
+    Example damage model: SoH lost by `count` cycles of the given depth and mean SoC.
+
+    A full-depth (1.0) cycle at 50% mean SoC costs eol_fade / cycles_to_eol of SoH;
+    shallower cycles cost depth**exponent times that (Woehler-style), and cycling at
+    high mean SoC is penalised by exp(soc_stress * (mean_soc - 0.5)).
+    """
+    return count * (eol_fade / cycles_to_eol) * depth ** exponent * math.exp(soc_stress * (mean_soc - 0.5))
+
+
+class RainflowCounter:
+    def __init__(self, damage_fn=soc_cycle_damage, hysteresis=1e-4):
+        """
+        Streaming rainflow (ASTM E1049 three-point) cycle counter for SoC samples.
+
+        Only the pending turning points are stored, so memory does not grow with the
+        number of samples. Every counted cycle is passed to damage_fn(depth, mean_soc, count)
+        (count is 0.5 or 1.0) and the returned SoH loss is accumulated.
+
+        Args:
+            damage_fn (callable): damage model, see soc_cycle_damage
+            hysteresis (float): SoC reversals smaller than this are treated as noise
+        """
+        self.damage_fn = damage_fn
+        self.hysteresis = hysteresis
+        self.damage = 0.0
+        self.cycles = 0.0
+
+        self._stack = []  # pending turning points
+        self._candidate = None  # current extreme, not yet confirmed as a turning point
+        self._direction = 0
+
+    def _count(self, a, b, count):
+        depth = abs(a - b)
+        damage = self.damage_fn(depth, (a + b) / 2, count)
+        self.damage += damage
+        self.cycles += count
+        return damage
+
+    def _push(self, point):
+        stack = self._stack
+        stack.append(point)
+        damage = 0.0
+        while len(stack) >= 3:
+            x = abs(stack[-1] - stack[-2])
+            y = abs(stack[-2] - stack[-3])
+            if x < y:
+                break
+            if len(stack) == 3:
+                # Range y contains the starting point: half cycle
+                damage += self._count(stack[0], stack[1], 0.5)
+                del stack[0]
+            else:
+                damage += self._count(stack[-3], stack[-2], 1.0)
+                del stack[-3:-1]
+        return damage
+
+    def update(self, soc):
+        """Feed one SoC sample; returns the SoH loss from cycles closed by it."""
+        if self._candidate is None:
+            self._candidate = soc
+            return self._push(soc)
+
+        if self._direction == 0:
+            if abs(soc - self._candidate) > self.hysteresis:
+                self._direction = 1 if soc > self._candidate else -1
+                self._candidate = soc
+            return 0.0
+
+        if (soc - self._candidate) * self._direction >= 0:
+            self._candidate = soc  # still moving the same way
+            return 0.0
+        if abs(soc - self._candidate) <= self.hysteresis:
+            return 0.0
+
+        # Reversal: the previous extreme becomes a turning point
+        damage = self._push(self._candidate)
+        self._candidate = soc
+        self._direction = -self._direction
+        return damage
+
+    def finish(self):
+        """Count the residual as half cycles (end of record); returns the SoH loss added."""
+        damage = 0.0
+        if self._direction != 0:
+            # The last extreme may still close a cycle with the pending turning points
+            damage += self._push(self._candidate)
+        for a, b in zip(self._stack[:-1], self._stack[1:]):
+            damage += self._count(a, b, 0.5)
+        self._stack = self._stack[-1:]
+        self._candidate = self._stack[-1] if self._stack else None
+        self._direction = 0
+        return damage
@@ -0,0 +1,90 @@
+from collections.abc import Mapping
+import numpy as np
+
+# Column order used by EMSController.dispatch_values + SoH
+RESULT_FIELDS = ('load_power', 'sc_power', 'batt_power', 'v_sc', 'v_batt', 'i_sc', 'i_batt', 'soc_batt', 'soh')
+
+
+class ResultRecorder(Mapping):
+    def __init__(self, steps=None, decimation=1, chunk_size=3600, width=None, dtype=np.float64, fields=RESULT_FIELDS):
+        """
+        Columnar store for simulation results.
+
+        Args:
+            steps (int): expected number of record() calls; sizes the columns up front.
+                         None starts with one chunk and grows as needed.
+            decimation (int): keep every Nth record() call (1 keeps all)
+            chunk_size (int): rows added each time an open-ended recorder fills up
+            width (int): optional second dimension, e.g. n_scenarios for HESSEngine
+            dtype: NumPy dtype of every column
+            fields (tuple): column names, in the positional order record() expects
+        """
+        self.fields = tuple(fields)
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+        self.decimation = max(1, int(decimation))
+        self.chunk_size = int(chunk_size)
+        self.width = width
+        self.dtype = dtype
+
+        rows = self.chunk_size if steps is None else -(-int(steps) // self.decimation)
+        self._chunks = []  # filled column blocks waiting to be joined
+        self._columns = self._allocate(max(rows, 1))
+        self._row = 0
+        self._calls = 0
+
+    def _allocate(self, rows):
+        shape = (rows,) if self.width is None else (rows, self.width)
+        return [np.empty(shape, dtype=self.dtype) for _ in self.fields]
+
+    def record(self, *values):
+        """Store one step; values are given in self.fields order."""
+        call = self._calls
+        self._calls += 1
+        if call % self.decimation:
+            return
+
+        if self._row == len(self._columns[0]):
+            self._chunks.append(self._columns)
+            self._columns = self._allocate(self.chunk_size)
+            self._row = 0
+
+        row = self._row
+        for column, value in zip(self._columns, values):
+            column[row] = value
+        self._row = row + 1
+
+    def record_snapshot(self, snapshot, **extra):
+        """Store a dispatch()-style dict (plus any missing fields passed as keywords)."""
+        self.record(*[snapshot[f] if f in snapshot else extra[f] for f in self.fields])
+
+    def _consolidate(self):
+        if self._chunks:
+            blocks = self._chunks + [[c[:self._row] for c in self._columns]]
+            self._columns = [np.concatenate(parts) for parts in zip(*blocks)]
+            self._row = len(self._columns[0])
+            self._chunks = []
+
+    @property
+    def rows(self):
+        """Number of stored rows."""
+        return sum(len(chunk[0]) for chunk in self._chunks) + self._row
+
+    @property
+    def index(self):
+        """Step index (0-based call number) of every stored row."""
+        return np.arange(self.rows) * self.decimation
+
+    def __getitem__(self, field):
+        i = self._field_index[field]
+        self._consolidate()
+        return self._columns[i][:self._row]
+
+    def lane(self, i):
+        """Dict of column views for one scenario of a width-N recorder."""
+        return {field: self[field][:, i] for field in self.fields}
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
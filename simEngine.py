@@ -0,0 +1,291 @@
+import numpy as np
+from droopControl import k_f
+from PIController import PIBank
+from resultRecorder import ResultRecorder
+from transientDetector import ExcursionBank, window_samples, rolling_excursion
+
+
+class HESSEngine:
+    def __init__(self, n_scenarios, batt_capacity=500, batt_voltage=480, batt_discharge_rate=250,
+                 soc_init=1.0, internal_resistance=0.005, capacitance=1000, sc_voltage_init=480,
+                 sc_r_internal=0.001, sc_max_voltage=500, discharge_rate_kW=10, use_supercap=True,
+                 transient_threshold=1000, window_seconds=1, degradation_rate=0.0001,
+                 f_nom=50.0, freq_kp=k_f, freq_ki=50.0, table=None, temperature_C=25.0, sc_table=None):
+        """
+        Array-backed HESS model that advances n_scenarios independent
+        Battery / Supercapacitor / EMSController sets in lockstep.
+
+        Every parameter may be a scalar (shared by all scenarios) or an array of
+        shape (n_scenarios,). The per-step maths mirrors batteryModel.Battery,
+        supercapModel.Supercapacitor, EMSController.dispatch and main.degrade_battery
+        (throughput degradation). f_nom / freq_kp / freq_ki configure the per-scenario
+        frequency-response PI bank used when step() is given f_measured. table (a
+        lookupTables.VoltageTable shared by all scenarios) and temperature_C switch the
+        batteries to table OCV / R(SoC, T) as in Battery, one batched lookup per step;
+        sc_table likewise gives the supercaps Supercapacitor's table ESR and I^2 R loss.
+        """
+        self.n = n_scenarios
+
+        def lane(value, dtype=float):
+            return np.broadcast_to(np.asarray(value, dtype=dtype), (n_scenarios,)).copy()
+
+        # Battery state
+        self.batt_voltage = lane(batt_voltage)
+        self.batt_r = lane(internal_resistance)
+        self.capacity_As = lane(batt_capacity) * 3600 * 1000 / self.batt_voltage  # convert kWh to As
+        self.batt_current = np.zeros(n_scenarios)
+        self.capacity = lane(batt_capacity)
+        self.nominal_capacity = lane(batt_capacity)
+        self.remaining_capacity = self.capacity * lane(soc_init)
+        self.soc = np.clip(lane(soc_init), 0.0, 1.0)
+        self.batt_discharge_rate = lane(batt_discharge_rate) * 10**3
+        self.discharge_efficiency = 0.90
+        self.table = table
+        self.temperature_C = lane(temperature_C)
+
+        # Degradation state
+        self.cycle_energy_throughput = np.zeros(n_scenarios)
+        self.soh = np.ones(n_scenarios)
+        self.degradation_rate = lane(degradation_rate)
+
+        # Supercapacitor state
+        self.use_supercap = lane(use_supercap, dtype=bool)
+        self.sc_c = lane(capacitance)
+        self.sc_voltage = lane(sc_voltage_init)
+        self.sc_max_voltage = lane(sc_max_voltage)
+        self.sc_r = lane(sc_r_internal)
+        self.sc_table = sc_table
+        # Scenarios without a supercap behave like main's DummySupercap (zero discharge rate)
+        self.sc_discharge_rate = np.where(self.use_supercap, lane(discharge_rate_kW) * 1000, 0.0)
+        self.freq_pi = PIBank(n_scenarios, kp=freq_kp, ki=freq_ki, setpoint=f_nom,
+                              output_limits=(0.0, self.sc_discharge_rate))
+
+        # Transient detector: ring buffer of recent demands, sized from dt on the first step
+        self.transient_threshold = lane(transient_threshold)
+        self.window_seconds = lane(window_seconds)
+        self._window = None
+        self._history = None
+        self._step = 0
+        self._extremes = None  # [(lanes, ExcursionBank)] per distinct window, rebuilt from _history
+
+    def _push_history(self, power_demand, dt):
+        if self._history is None:
+            self._window = window_samples(self.window_seconds, dt)
+            self._history = np.zeros((self.n, int(self._window.max())))
+        slot = self._step % self._history.shape[1]
+        self._history[:, slot] = power_demand
+        self._step += 1
+        return slot
+
+    def recent_demand(self):
+        """Stored demand history, oldest first, shape (n_scenarios, samples)."""
+        if self._history is None:
+            return np.zeros((self.n, 0))
+        width = self._history.shape[1]
+        filled = min(self._step, width)
+        order = (self._step - filled + np.arange(filled)) % width
+        return self._history[:, order]
+
+    def detect_transient(self, power_demand, dt):
+        # Flag when max - min of demand over each scenario's window exceeds its threshold
+        if self._extremes is None:
+            self._extremes = self._build_extremes(dt)
+        self._push_history(power_demand, dt)
+        excursion = np.empty(self.n)
+        for lanes, bank in self._extremes:
+            excursion[lanes] = bank.update(power_demand[lanes])
+        return excursion > self.transient_threshold
+
+    def _build_extremes(self, dt):
+        # One ExcursionBank per distinct window length, primed with the stored history
+        windows = window_samples(self.window_seconds, dt) if self._window is None else self._window
+        history = self.recent_demand()
+        extremes = []
+        for w in np.unique(windows):
+            lanes = np.flatnonzero(windows == w)
+            bank = ExcursionBank(len(lanes), w)
+            for column in history[lanes, max(0, history.shape[1] - (int(w) - 1)):].T:
+                bank.update(column)
+            extremes.append((lanes, bank))
+        return extremes
+
+    def precompute_transients(self, load_W, dt):
+        """
+        Vectorised detector pre-pass for a load shared by every scenario: returns a
+        (steps, n_scenarios) bool array equal to what detect_transient would produce
+        step by step from the current state. Returns None when scenario histories differ.
+        """
+        history = self.recent_demand()
+        if history.shape[1] and not np.all(history == history[:1]):
+            return None
+        windows = window_samples(self.window_seconds, dt) if self._window is None else self._window
+
+        flags = np.empty((len(load_W), self.n), dtype=bool)
+        for w in np.unique(windows):
+            lanes = windows == w
+            excursion = rolling_excursion(load_W, int(w), history[0] if history.shape[1] else None)
+            flags[:, lanes] = excursion[:, None] > self.transient_threshold[lanes]
+        return flags
+
+    def supercap_deliver_power(self, power, dt):
+        # Only discharging is modelled; charging requests leave the voltage unchanged
+        active = self.use_supercap & (power < 0) & (self.sc_voltage > 0.1)
+
+        power = np.maximum(power, -self.sc_discharge_rate)
+        safe_voltage = np.where(active, self.sc_voltage, 1.0)
+        if self.sc_table is None:
+            current = np.where(active, power / safe_voltage, 0.0)
+            terminal_voltage = None
+        else:
+            # As Supercapacitor._esr_current: -P = |I| (V - |I| R), smaller root or maximum-power current
+            r = self.sc_r * self.sc_table.resistance_factor(self.sc_voltage / self.sc_max_voltage, self.temperature_C)
+            discriminant = safe_voltage ** 2 + 4 * r * np.where(active, power, 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                magnitude = np.where(discriminant > 0, (safe_voltage - np.sqrt(np.maximum(discriminant, 0.0))) / (2 * r),
+                                     safe_voltage / (2 * r))
+                magnitude = np.where(r > 0, magnitude, -power / safe_voltage)
+            current = np.where(active, -magnitude, 0.0)
+            terminal_voltage = np.where(active, self.sc_voltage - magnitude * r, self.sc_voltage)
+        self.sc_voltage = self.sc_voltage + (current * dt) / self.sc_c
+        if terminal_voltage is None:
+            terminal_voltage = self.sc_voltage
+
+        v_sc = np.where(self.use_supercap, terminal_voltage, 0.0)
+        return v_sc, current
+
+    def battery_discharge(self, power_load, dt):
+        active = (power_load > 0) & (self.soc > 0)
+
+        power_load = np.minimum(power_load, self.batt_discharge_rate)
+
+        if self.table is None:
+            source_voltage, r = self.batt_voltage, self.batt_r
+        else:
+            source_voltage = self.batt_voltage / self.table.nominal_ocv * self.table.ocv(self.soc)
+            r = self.batt_r * self.table.resistance_factor(self.soc, self.temperature_C)
+
+        # Estimate current and terminal voltage with internal resistance
+        current = power_load / source_voltage
+        terminal_voltage = np.maximum(0.0, source_voltage - current * r)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            current = np.where(terminal_voltage > 0, power_load / terminal_voltage, 0.0)
+
+        # Limit current to what the battery can handle
+        max_current = self.batt_discharge_rate / self.batt_voltage
+        current = np.minimum(current, max_current)
+
+        # SOC drop due to energy drained, with a nonlinear factor
+        linear_drop = (current * dt) / self.capacity_As
+        scale = 1.5 - np.exp(-5 * (1 - self.soc)) if self.table is None else self.table.drop_scale(self.soc)
+        nonlinear_drop = linear_drop * scale
+
+        energy_used_kWh = ((power_load*10**-3) * dt) / 3600
+        actual_energy_removed = energy_used_kWh / self.discharge_efficiency
+
+        remaining = np.maximum(0.0, self.remaining_capacity - actual_energy_removed)
+        self.remaining_capacity = np.where(active, remaining, self.remaining_capacity)
+        self.soc = np.where(active, (self.remaining_capacity / self.capacity) - nonlinear_drop, self.soc)
+        self.batt_current = np.where(active, current, 0.0)
+
+        return np.where(active, terminal_voltage, self.batt_voltage), self.batt_current
+
+    def degrade(self, batt_power, dt):
+        energy_discharged_kWh = np.abs(batt_power) * dt / 3600 / 1000
+
+        self.cycle_energy_throughput += energy_discharged_kWh
+        capacity_loss = self.cycle_energy_throughput * self.degradation_rate
+        self.soh = np.maximum(0.0, 1.0 - capacity_loss)
+        self.capacity = self.nominal_capacity * self.soh
+
+        self.remaining_capacity = np.minimum(self.remaining_capacity, self.capacity)
+        self.soc = np.clip(self.remaining_capacity / self.capacity, 0.0, 1.0)
+
+    def step(self, power_demand, dt, is_transient=None, f_measured=None):
+        """
+        Advance every scenario by one timestep.
+
+        Args:
+            power_demand: demand in W, scalar or array of shape (n_scenarios,)
+            dt: timestep in seconds
+            is_transient: optional precomputed detector output (see precompute_transients)
+            f_measured: optional grid frequency in Hz, scalar or (n_scenarios,); enables
+                        supercap frequency response as in EMSController.dispatch
+
+        Returns:
+            dict of (n_scenarios,) arrays with the same keys as EMSController.dispatch plus 'soh'
+        """
+        power_demand = np.broadcast_to(np.asarray(power_demand, dtype=float), (self.n,))
+        if is_transient is None:
+            is_transient = self.detect_transient(power_demand, dt)
+        else:
+            self._push_history(power_demand, dt)
+            self._extremes = None  # out of date; rebuilt if detect_transient is used again
+
+        # SC discharges up to its max rate (negative because discharging)
+        sc_power = np.where(is_transient, -np.minimum(np.abs(power_demand), self.sc_discharge_rate), 0.0)
+        batt_power_requested = power_demand + sc_power  # sc_power < 0 is supplied by the SC
+
+        if f_measured is not None:
+            headroom = np.maximum(0.0, self.sc_discharge_rate - np.abs(sc_power))
+            sc_power = sc_power - self.freq_pi.update(f_measured, dt, upper=headroom)
+
+        v_sc, i_sc = self.supercap_deliver_power(sc_power, dt)
+        v_batt, i_batt = self.battery_discharge(batt_power_requested, dt)
+        soc_batt = self.soc.copy()
+
+        self.degrade(batt_power_requested, dt)
+
+        return {
+            'load_power': power_demand,
+            'sc_power': sc_power,
+            'batt_power': batt_power_requested,
+            'v_sc': v_sc,
+            'v_batt': v_batt,
+            'i_sc': i_sc,
+            'i_batt': i_batt,
+            'soc_batt': soc_batt,
+            'soh': self.soh.copy(),
+        }
+
+    def run(self, load_kw, dt, recorder=None, f_measured=None):
+        """
+        Run the whole load profile through every scenario.
+
+        Args:
+            load_kw: load in kW, shape (steps,) shared by all scenarios or (steps, n_scenarios)
+            dt: timestep in seconds
+            recorder: optional ResultRecorder with width=n_scenarios (one is created if omitted)
+            f_measured: optional grid frequency in Hz aligned with load_kw, shape (steps,)
+                        or (steps, n_scenarios); passed to step() to enable frequency response
+
+        Returns:
+            ResultRecorder of (rows, n_scenarios) columns keyed like step()
+        """
+        load_kw = np.asarray(load_kw, dtype=float)
+        steps = load_kw.shape[0]
+        if recorder is None:
+            recorder = ResultRecorder(steps, width=self.n)
+
+        # A shared load lets the detector run as one vectorised pass instead of per step
+        flags = self.precompute_transients(load_kw * 1000, dt) if load_kw.ndim == 1 else None
+
+        if f_measured is not None:
+            f_measured = np.asarray(f_measured, dtype=float)
+            if f_measured.shape[0] != steps:
+                raise ValueError("f_measured must have one entry per load step")
+
+        for t in range(steps):
+            snapshot = self.step(load_kw[t] * 1000, dt, None if flags is None else flags[t],  # kW to W
+                                 None if f_measured is None else f_measured[t])
+            recorder.record_snapshot(snapshot)
+
+        return recorder
+
+
+def run_scenarios(load_kw, dt, n_scenarios, **params):
+    """
+    Convenience wrapper: build a HESSEngine for n_scenarios and run load_kw through it.
+    Keyword arguments are forwarded to HESSEngine (scalars or per-scenario arrays).
+    """
+    engine = HESSEngine(n_scenarios, **params)
+    return engine.run(load_kw, dt)
@@ -1,11 +1,25 @@
+import math
+from lookupTables import interp_uniform
+
 class Supercapacitor:
-    def __init__(self, capacitance, voltage_init=480, r_internal=0.001, max_voltage=500, discharge_rate_kW=10):
+    def __init__(self, capacitance, voltage_init=480, r_internal=0.001, max_voltage=500, discharge_rate_kW=10,
+                 table=None, temperature_C=25.0):
+        """
+        Ideal capacitor bank. With table (a lookupTables.VoltageTable, e.g.
+        default_supercap_table()) the ESR r_internal is scaled by the table's factor at
+        V / max_voltage and temperature_C and is no longer lossless: the bank supplies the
+        requested power plus its I^2 R loss, and returns its terminal voltage.
+        """
         self.c = capacitance  # Farads
         self.voltage = voltage_init  # Volts
         self.max_voltage = max_voltage
         self.r = r_internal  # Ohms
         self.discharge_rate = discharge_rate_kW * 1000  # Convert kW to W
         self.power = 0.5 * self.c * (self.voltage ** 2)  # Stored energy in Joules
+        self.table = table
+        self.temperature_C = temperature_C
+        self._r_list = None
+        self._r_temperature = None
 
     def deliver_power(self, power, dt):
         # power > 0: charging (currently ignored or clamped)
@@ -23,11 +37,29 @@ class Supercapacitor:
 
         # Cap discharge to max discharge rate
         power = max(power, -self.discharge_rate)  # power is negative when discharging
-        current = power / self.voltage  # Current will be negative
+        if self.table is None:
+            current = power / self.voltage  # Current will be negative
+            terminal_voltage = None
+        else:
+            current, terminal_voltage = self._esr_current(power)
         dv = (current * dt) / self.c
         self.voltage += dv  # dv is negative => voltage decreases
 
         # Update stored power
         self.power = 0.5 * self.c * (self.voltage ** 2)
 
+        if terminal_voltage is not None:
+            return terminal_voltage, current
         return self.voltage, current
+
+    def _esr_current(self, power):
+        if self._r_temperature != self.temperature_C:
+            self._r_list = (self.table.resistance_column(self.temperature_C) * self.r).tolist()
+            self._r_temperature = self.temperature_C
+        r = interp_uniform(self._r_list, self.voltage / self.max_voltage)
+        if r <= 0:
+            return power / self.voltage, self.voltage
+        # -P = |I| (V - |I| R); take the smaller root, or the maximum-power current
+        discriminant = self.voltage ** 2 + 4 * r * power
+        magnitude = (self.voltage - math.sqrt(discriminant)) / (2 * r) if discriminant > 0 else self.voltage / (2 * r)
+        return -magnitude, self.voltage - magnitude * r
@@ -0,0 +1,127 @@
+import inspect
+import itertools
+import os
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from simEngine import HESSEngine
+
+# HESSEngine keyword arguments that a sweep grid may vary
+SWEEP_PARAMS = ('capacitance', 'discharge_rate_kW', 'transient_threshold', 'window_seconds',
+                'batt_capacity', 'degradation_rate')
+
+# Numeric HESSEngine keyword arguments that may differ per lane (sweep scenarios, fleet sites)
+LANE_PARAMS = ('batt_capacity', 'batt_voltage', 'batt_discharge_rate', 'soc_init', 'internal_resistance',
+               'capacitance', 'sc_voltage_init', 'sc_r_internal', 'sc_max_voltage', 'discharge_rate_kW',
+               'use_supercap', 'transient_threshold', 'window_seconds', 'degradation_rate', 'f_nom', 'freq_kp',
+               'freq_ki', 'temperature_C')
+
+SUMMARY_FIELDS = ('final_soc', 'final_soh', 'peak_batt_power_kW', 'sc_energy_used_kWh')
+
+_ENGINE_DEFAULTS = {name: p.default for name, p in inspect.signature(HESSEngine).parameters.items()
+                    if p.default is not inspect.Parameter.empty}
+
+_shared = {}  # per-worker handle on the shared load profile
+
+
+def build_grid(**axes):
+    """
+    Cartesian product of parameter values, e.g.
+    build_grid(capacitance=[500, 1000], transient_threshold=[500, 1000]) -> 4 scenario dicts.
+    """
+    unknown = set(axes) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"Unsupported sweep parameters: {sorted(unknown)}")
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def _attach_load(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    _shared['shm'] = shm  # keep the mapping alive for the worker's lifetime
+    _shared['load'] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def build_engine(lanes, base_params=None):
+    """
+    HESSEngine with one lane per dict in lanes. base_params apply to every lane; LANE_PARAMS
+    keys present in a lane dict override them for that lane, other keys are ignored.
+    """
+    params = dict(_ENGINE_DEFAULTS, **(base_params or {}))
+    for key in LANE_PARAMS:
+        if any(key in lane for lane in lanes):
+            params[key] = np.array([lane.get(key, params[key]) for lane in lanes], dtype=float)
+    return HESSEngine(len(lanes), **params)
+
+
+class LaneSummary:
+    def __init__(self, engine):
+        """Per-lane SUMMARY_FIELDS of an engine run; call update() with every step's snapshot."""
+        self.engine = engine
+        self.v_sc_start = engine.sc_voltage.copy()
+        self.peak_batt_power = np.zeros(engine.n)
+
+    def update(self, snapshot):
+        np.maximum(self.peak_batt_power, snapshot['batt_power'], out=self.peak_batt_power)
+
+    def rows(self):
+        """One SUMMARY_FIELDS dict per lane."""
+        engine = self.engine
+        # Energy drawn from the supercap: 0.5 * C * (V0^2 - V^2), J -> kWh
+        sc_energy_kWh = 0.5 * engine.sc_c * (self.v_sc_start ** 2 - engine.sc_voltage ** 2) / 3.6e6
+        return [{'final_soc': float(engine.soc[i]),
+                 'final_soh': float(engine.soh[i]),
+                 'peak_batt_power_kW': float(self.peak_batt_power[i] / 1000),
+                 'sc_energy_used_kWh': float(sc_energy_kWh[i])} for i in range(engine.n)]
+
+
+def _run_block(scenarios, dt, base_params, load_kw=None):
+    """Run a block of scenarios as one HESSEngine and summarise each lane."""
+    if load_kw is None:
+        load_kw = _shared['load']
+
+    engine = build_engine(scenarios, base_params)
+    summary = LaneSummary(engine)
+    flags = engine.precompute_transients(load_kw * 1000, dt)  # skips the per-step detector
+    for t, demand_kw in enumerate(load_kw):
+        summary.update(engine.step(demand_kw * 1000, dt, flags[t]))  # kW to W
+
+    return [dict(scenario, **row) for scenario, row in zip(scenarios, summary.rows())]
+
+
+def run_sweep(grid, load_kw, dt, processes=None, blocks_per_process=4, **base_params):
+    """
+    Run every scenario of grid against the same load profile.
+
+    The load is copied once into shared memory and the scenarios are split into blocks,
+    each simulated as one vectorised HESSEngine in a worker process.
+
+    Args:
+        grid (list[dict]): scenarios, e.g. from build_grid()
+        load_kw (array): community load in kW, shared by every scenario
+        dt (float): timestep in seconds
+        processes (int): worker processes (default os.cpu_count(); 1 runs in-process)
+        blocks_per_process (int): blocks queued per worker, for load balancing
+        base_params: HESSEngine keyword arguments applied to every scenario
+
+    Returns:
+        list of dicts, one row per scenario in grid order: the scenario parameters
+        plus SUMMARY_FIELDS
+    """
+    load_kw = np.ascontiguousarray(load_kw, dtype=np.float64)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        return _run_block(list(grid), dt, base_params, load_kw)
+
+    n_blocks = max(1, min(len(grid), processes * blocks_per_process))
+    blocks = [list(block) for block in np.array_split(np.array(grid, dtype=object), n_blocks) if len(block)]
+
+    shm = shared_memory.SharedMemory(create=True, size=load_kw.nbytes)
+    try:
+        np.ndarray(load_kw.shape, dtype=load_kw.dtype, buffer=shm.buf)[:] = load_kw
+        with Pool(processes, initializer=_attach_load, initargs=(shm.name, load_kw.shape, load_kw.dtype)) as pool:
+            results = pool.starmap(_run_block, [(block, dt, base_params) for block in blocks])
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return [row for block in results for row in block]
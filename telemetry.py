@@ -0,0 +1,124 @@
+import csv
+from collections import deque
+import numpy as np
+from resultRecorder import RESULT_FIELDS
+
+# Telemetry levels; each level includes everything below it
+OFF = 0
+COUNTERS = 1  # transient / supercap dispatch (steps with sc_power != 0) counts
+EVENTS = 2    # + ring buffer of recent transient events
+TRACE = 3     # + every step written to the trace sink
+
+# Columns written by EMSTelemetry at TRACE level
+TRACE_FIELDS = ('time', 'is_transient', 'power_change') + RESULT_FIELDS[:-1]
+
+
+class TraceSink:
+    def __init__(self, path, fields=TRACE_FIELDS, batch_size=4096):
+        """
+        Buffered per-step trace writer.
+
+        Args:
+            path (str): output file; '.csv' writes text with a header row,
+                        anything else writes raw float64 rows (see read_trace)
+            fields (tuple): column names (defaults to TRACE_FIELDS)
+            batch_size (int): rows buffered in memory before each write
+        """
+        self.path = path
+        self.fields = tuple(fields)
+        self.batch_size = batch_size
+        self.csv = str(path).endswith('.csv')
+        self._rows = []
+
+        self._file = open(path, 'w', newline='') if self.csv else open(path, 'wb')
+        if self.csv:
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.fields)
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        if self.csv:
+            self._writer.writerows(self._rows)
+        else:
+            np.asarray(self._rows, dtype=np.float64).tofile(self._file)
+        self._rows = []
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(path, fields=TRACE_FIELDS):
+    """Load a binary trace written by TraceSink as a dict of columns."""
+    data = np.fromfile(path, dtype=np.float64).reshape(-1, len(fields))
+    return {field: data[:, i] for i, field in enumerate(fields)}
+
+
+class EMSTelemetry:
+    def __init__(self, level=EVENTS, event_capacity=256, trace_sink=None):
+        """
+        Structured event surface for EMSController.
+
+        Args:
+            level (int): OFF, COUNTERS, EVENTS or TRACE
+            event_capacity (int): number of recent transient events kept
+            trace_sink (TraceSink): destination for per-step rows at TRACE level
+        """
+        self.level = level
+        self.trace_sink = trace_sink
+
+        self.steps = 0
+        self.time = 0.0  # seconds since the controller started
+        self.transients_detected = 0
+        self.sc_dispatches = 0
+        # (time_s, step, power_change_W, demand_W) of the most recent transients
+        self.events = deque(maxlen=event_capacity)
+
+    def on_step(self, dt, is_transient, power_change, values):
+        """
+        Called once per EMSController step.
+
+        Args:
+            dt (float): step length in seconds
+            is_transient (bool): detector output for this step
+            power_change (float): demand change over the detection window (W)
+            values (tuple): dispatch values in DISPATCH_FIELDS order
+        """
+        if self.level >= COUNTERS:
+            if values[1] != 0:
+                self.sc_dispatches += 1  # any step the supercap supplies power, in either EMS mode
+            if is_transient:
+                self.transients_detected += 1
+                if self.level >= EVENTS:
+                    self.events.append((self.time, self.steps, float(power_change), float(values[0])))
+            if self.level >= TRACE and self.trace_sink is not None:
+                self.trace_sink.write((self.time, int(is_transient), power_change) + tuple(values))
+
+        self.steps += 1
+        self.time += dt
+
+    def summary(self):
+        return {
+            'steps': self.steps,
+            'transients_detected': self.transients_detected,
+            'sc_dispatches': self.sc_dispatches,
+            'recent_events': list(self.events),
+        }
+
+    def close(self):
+        if self.trace_sink is not None:
+            self.trace_sink.close()
@@ -0,0 +1,131 @@
+from collections import deque
+import numpy as np
+
+
+def window_samples(window_seconds, dt):
+    """
+    Number of samples spanned by a window_seconds look-back at timestep dt, counting the
+    current sample. Always at least 2, so a step change between consecutive samples is
+    visible even when dt is longer than the window.
+    """
+    steps = np.maximum(1, np.ceil(np.asarray(window_seconds, dtype=float) / dt - 1e-9)).astype(int)
+    return steps + 1
+
+
+class TransientDetector:
+    def __init__(self, transient_threshold, window_seconds, dt):
+        """
+        Online sliding-window transient detector.
+
+        A transient is flagged when max - min of the demand over the last window_seconds
+        (sized from dt) exceeds transient_threshold. Running max/min are kept in monotonic
+        deques, so each update is amortised O(1) regardless of the window length.
+        """
+        self.transient_threshold = transient_threshold
+        self.window = int(window_samples(window_seconds, dt))
+        self.last_excursion = 0.0
+        self._index = 0
+        self._max = deque()  # (index, value), values decreasing
+        self._min = deque()  # (index, value), values increasing
+
+    def update(self, power_demand):
+        i = self._index
+        self._index += 1
+
+        while self._max and self._max[-1][1] <= power_demand:
+            self._max.pop()
+        self._max.append((i, power_demand))
+        while self._min and self._min[-1][1] >= power_demand:
+            self._min.pop()
+        self._min.append((i, power_demand))
+
+        # Drop samples that have left the window
+        oldest = i - self.window + 1
+        if self._max[0][0] < oldest:
+            self._max.popleft()
+        if self._min[0][0] < oldest:
+            self._min.popleft()
+
+        self.last_excursion = self._max[0][1] - self._min[0][1]
+        return self.last_excursion > self.transient_threshold
+
+
+class ExcursionBank:
+    def __init__(self, n, window):
+        """
+        Streaming max - min over the last window samples for n lanes sharing one window
+        length: the online form of rolling_excursion's block scheme. Samples are grouped
+        in blocks of window; the running extreme of the current block (prefix) and the
+        suffix extremes of the previous block, computed once when it completes, give each
+        window's extreme in O(1), so an update is amortised O(1) per lane. Windows
+        reaching back before the first sample use only the samples seen, as in
+        TransientDetector.
+        """
+        self.window = int(window)
+        self._block = np.empty((n, self.window))
+        # Suffix extremes of the previous block, one extra column for "nothing left"
+        self._suffix_max = np.full((n, self.window + 1), -np.inf)
+        self._suffix_min = np.full((n, self.window + 1), np.inf)
+        self._prefix_max = np.full(n, -np.inf)
+        self._prefix_min = np.full(n, np.inf)
+        self._pos = 0
+
+    def update(self, values):
+        """Add one sample per lane; returns the (n,) excursion of each lane's window."""
+        p = self._pos
+        self._block[:, p] = values
+        np.maximum(self._prefix_max, values, out=self._prefix_max)
+        np.minimum(self._prefix_min, values, out=self._prefix_min)
+        # The window is positions p+1.. of the previous block plus 0..p of this one
+        excursion = (np.maximum(self._suffix_max[:, p + 1], self._prefix_max)
+                     - np.minimum(self._suffix_min[:, p + 1], self._prefix_min))
+
+        self._pos += 1
+        if self._pos == self.window:
+            self._suffix_max[:, :-1] = np.maximum.accumulate(self._block[:, ::-1], axis=1)[:, ::-1]
+            self._suffix_min[:, :-1] = np.minimum.accumulate(self._block[:, ::-1], axis=1)[:, ::-1]
+            self._prefix_max.fill(-np.inf)
+            self._prefix_min.fill(np.inf)
+            self._pos = 0
+        return excursion
+
+
+def _running_extreme(padded, window, ufunc):
+    # van Herk / Gil-Werman: with blocks of `window` samples every window spans at most two
+    # blocks, so a block suffix extreme and a block prefix extreme give its result in O(1)
+    n_out = len(padded) - window + 1
+    blocks = -(-len(padded) // window)
+    x = np.concatenate([padded, np.full(blocks * window - len(padded), padded[-1])]).reshape(blocks, window)
+    prefix = ufunc.accumulate(x, axis=1).ravel()
+    suffix = ufunc.accumulate(x[:, ::-1], axis=1)[:, ::-1].ravel()
+    starts = np.arange(n_out)
+    return ufunc(suffix[starts], prefix[starts + window - 1])
+
+
+def rolling_excursion(values, window, history=None):
+    """
+    max - min over the trailing window (in samples) ending at every element of values.
+
+    history holds samples preceding values (oldest first); windows that reach back
+    before the available data use only the samples that exist, matching TransientDetector.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return values.copy()
+    past = np.asarray(history if history is not None else [], dtype=float)
+    past = past[max(0, len(past) - (window - 1)):] if window > 1 else past[:0]
+    series = np.concatenate([past, values])
+    # Pad the front with the first sample: it is in every partial window, so extremes are unchanged
+    padded = np.concatenate([np.full(window - 1, series[0]), series])
+    high = _running_extreme(padded, window, np.maximum)
+    low = _running_extreme(padded, window, np.minimum)
+    return (high - low)[len(past):]
+
+
+def detect_transients(load_W, transient_threshold, window_seconds, dt, history=None):
+    """
+    Vectorised pre-pass: flag every sample of load_W where TransientDetector would report
+    a transient. Returns (flags, excursion) arrays.
+    """
+    excursion = rolling_excursion(load_W, int(window_samples(window_seconds, dt)), history)
+    return excursion > transient_threshold, excursion